@@ -0,0 +1,211 @@
+"""Async versions of the hottest read endpoints for the ASGI server mode.
+
+Only plain JSON ``GET`` requests are answered here. Writes, the browsable
+API and ``?format=`` requests are passed to the regular DRF view, which
+Django runs in a worker thread.
+"""
+from functools import wraps
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.db import replica_configured, replica_reads
+from foodgram.pagination import PageNumberPagination
+from users.authentication import CachedTokenAuthentication
+from .autocomplete import get_search_limit, ingredient_index
+from .conditional import get_etag, recipe_list_state, recipe_state
+from .filters import RecipeFilterBackend
+from .models import Recipe
+from .renderers import FastJSONRenderer
+from .shopping_cart import (
+    CHUNK_SIZE, EXPORTS, get_shopping_cart_ingredients, shopping_cart_response
+)
+from .views import IngredientsViewSet, RecipeViewSet, ShoppingCartGet
+
+JSON = 'application/json'
+
+
+def render_json(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, content_type=JSON)
+
+
+def error_response(exc):
+    response = render_json({'detail': exc.detail}, exc.status_code)
+    if isinstance(exc, (
+        exceptions.NotAuthenticated, exceptions.AuthenticationFailed
+    )):
+        response['WWW-Authenticate'] = (
+            CachedTokenAuthentication().authenticate_header(None))
+    return response
+
+
+def async_read(fallback, json_only=True, replica=True):
+    """Serve ``GET`` with the decorated coroutine and the rest with DRF.
+
+    The coroutine receives a DRF ``Request`` whose user is already
+    authenticated. With ``replica`` its reads go to the replica when one is
+    configured.
+    """
+    fallback = sync_to_async(fallback)
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or (json_only and (
+                'format' in request.GET or
+                'text/html' in request.headers.get('Accept', '')
+            )):
+                return await fallback(request, *args, **kwargs)
+            request = Request(
+                request, authenticators=[CachedTokenAuthentication()])
+            request.accepted_media_type = JSON
+            try:
+                await sync_to_async(getattr)(request, 'user')
+                token = replica_reads.set(replica and replica_configured())
+                try:
+                    return await handler(request, *args, **kwargs)
+                finally:
+                    replica_reads.reset(token)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        # DRF views do not use session authentication, and neither do these.
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def conditional_response(request, state, build):
+    """Answer 304 from the version state before building the response."""
+    last_modified = None
+    etag = None
+    if state is not None:
+        etag = quote_etag(get_etag(request, state))
+        last_modified = int(state[1].timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+    response = await build()
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+async def paginate_ids(request, queryset):
+    """Page number pagination over ids with the async ORM.
+
+    Mirrors ``PageNumberPagination``; cursor pages are left to it.
+    """
+    paginator = PageNumberPagination()
+    page_size = paginator.get_page_size(request)
+    count = await queryset.acount()
+    pages = max(ceil(count / page_size), 1)
+    page = request.query_params.get(paginator.page_query_param, 1)
+    if page in paginator.last_page_strings:
+        page = pages
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        raise exceptions.NotFound('Invalid page.')
+    if page < 1 or page > pages:
+        raise exceptions.NotFound('Invalid page.')
+    offset = (page - 1) * page_size
+    ids = [
+        recipe.id
+        async for recipe in queryset[offset:offset + page_size]
+    ]
+    url = request.build_absolute_uri()
+    if page == 1:
+        previous = None
+    elif page == 2:
+        previous = remove_query_param(url, paginator.page_query_param)
+    else:
+        previous = replace_query_param(
+            url, paginator.page_query_param, page - 1)
+    following = None
+    if page < pages:
+        following = replace_query_param(
+            url, paginator.page_query_param, page + 1)
+    return ids, {'count': count, 'next': following, 'previous': previous}
+
+
+def recipe_view(request):
+    return RecipeViewSet(request=request, format_kwarg=None, kwargs={})
+
+
+recipe_list_fallback = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+ingredient_list_fallback = IngredientsViewSet.as_view({'get': 'list'})
+
+
+@async_read(recipe_list_fallback)
+async def recipe_list(request):
+    if PageNumberPagination.cursor_pagination_class.cursor_query_param in (
+        request.query_params
+    ):
+        return await sync_to_async(recipe_list_fallback)(request._request)
+    state = await sync_to_async(recipe_list_state)(request)
+
+    async def build():
+        queryset = RecipeFilterBackend().filter_queryset(
+            request, Recipe.objects.only('id'), None)
+        ids, page = await paginate_ids(request, queryset)
+        page['results'] = await sync_to_async(
+            recipe_view(request).get_cached_data)(ids)
+        return render_json(page)
+
+    return await conditional_response(request, state, build)
+
+
+@async_read(RecipeViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+    'delete': 'destroy'
+}))
+async def recipe_detail(request, pk):
+    state = await sync_to_async(recipe_state)(request, pk=pk)
+    if state is None:
+        raise exceptions.NotFound()
+
+    async def build():
+        data = await sync_to_async(recipe_view(request).get_cached_data)([pk])
+        if not data:
+            raise exceptions.NotFound()
+        return render_json(data[0])
+
+    return await conditional_response(request, state, build)
+
+
+@async_read(ingredient_list_fallback)
+async def ingredient_list(request):
+    if 'name' not in request.query_params:
+        return await sync_to_async(ingredient_list_fallback)(request._request)
+    return render_json(await sync_to_async(ingredient_index.search)(
+        request.query_params.get('name'),
+        get_search_limit(request.query_params)
+    ))
+
+
+@async_read(ShoppingCartGet.as_view(), json_only=False, replica=False)
+async def download_shopping_cart(request):
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    if request.query_params.get('format', 'txt') not in EXPORTS:
+        raise exceptions.NotFound()
+    view = ShoppingCartGet()
+    renderer, _ = view.get_content_negotiator().select_renderer(
+        request, view.get_renderers())
+    group_by = request.query_params.get('group_by')
+    if group_by not in (None, 'recipe'):
+        raise exceptions.ParseError('Unknown group_by value.')
+    ingredients = get_shopping_cart_ingredients(
+        [request.user], group_by).iterator(chunk_size=CHUNK_SIZE)
+    return shopping_cart_response(
+        ingredients, renderer.format, group_by is not None)
@@ -0,0 +1,114 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ParseError
+
+from foodgram.db import use_primary
+from .cache import (
+    INGREDIENTS_VERSION_KEY as VERSION_KEY, get_version, new_version
+)
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """In-process copy of the ingredient catalog for autocomplete.
+
+    Names are kept casefolded in a sorted list, so prefix matches are a
+    binary search and substring matches a scan over a couple of thousand
+    strings. The copy is reloaded when the catalog version stored in the
+    cache changes, which ``api.cache`` does once ingredient writes commit;
+    catalogs larger than ``INGREDIENT_INDEX_MAX_SIZE`` are
+    searched in the database instead.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._state = (None, None, None)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'INGREDIENT_INDEX_MAX_SIZE', 20000)
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, new_version(), None)
+        self._state = (None, None, None)
+
+    def current_version(self):
+        return get_version(VERSION_KEY)
+
+    def load(self):
+        version = self.current_version()
+        state = self._state
+        if state[0] is not None and state[0] == version:
+            return state
+        with self._lock:
+            if self._state[0] == version:
+                return self._state
+            with use_primary():
+                rows = list(
+                    Ingredient.objects.values('id', 'name', 'measurement_unit')
+                    .order_by()[:self.max_size + 1]
+                )
+            if len(rows) > self.max_size:
+                self._state = (version, None, None)
+                return self._state
+            rows.sort(key=lambda row: (row['name'].casefold(), row['id']))
+            keys = [row['name'].casefold() for row in rows]
+            self._state = (version, keys, rows)
+            return self._state
+
+    def search(self, query, limit):
+        query = query.strip().casefold()
+        _, keys, rows = self.load()
+        if keys is None:
+            return self.search_database(query, limit)
+
+        results = []
+        position = bisect_left(keys, query)
+        while (
+            position < len(keys) and len(results) < limit and
+            keys[position].startswith(query)
+        ):
+            results.append(rows[position])
+            position += 1
+        if len(results) < limit:
+            matches = sorted(
+                (key.find(query), key, index)
+                for index, key in enumerate(keys)
+                if query in key and not key.startswith(query)
+            )
+            results += [
+                rows[index] for _, _, index in matches[:limit - len(results)]
+            ]
+        return results
+
+    def search_database(self, query, limit):
+        queryset = Ingredient.objects.values('id', 'name', 'measurement_unit')
+        results = list(
+            queryset.filter(name__istartswith=query).order_by('name')[:limit]
+        )
+        if len(results) < limit:
+            results += list(
+                queryset.filter(name__icontains=query)
+                .exclude(name__istartswith=query)
+                .order_by('name')[:limit - len(results)]
+            )
+        return results
+
+
+ingredient_index = IngredientIndex()
+
+
+def get_search_limit(params):
+    """``?limit=`` between 1 and ``INGREDIENT_SEARCH_LIMIT``."""
+    if 'limit' not in params:
+        return settings.INGREDIENT_SEARCH_LIMIT
+    try:
+        limit = int(params.get('limit'))
+    except ValueError:
+        raise ParseError('limit must be an integer.')
+    if limit < 1:
+        raise ParseError('limit must be positive.')
+    return min(limit, settings.INGREDIENT_SEARCH_LIMIT)
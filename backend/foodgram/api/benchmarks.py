@@ -0,0 +1,406 @@
+import json
+import random
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Any, Callable, NamedTuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from users.authentication import invalidate_token
+from users.models import User
+from .models import FeedEntry, Ingredient, Recipe, Tag, UsableIngredient
+from .renderers import FastJSONRenderer
+from .representations import load_recipes
+from .search import search_document
+from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+
+BUDGETS_PATH = Path(__file__).with_name('benchmark_budgets.json')
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-benchmark',
+    }
+}
+PASSWORD = 'bench-password'
+IMAGE = (
+    'data:image/gif;base64,R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAA'
+    'ICRAEAOw=='
+)
+
+
+def _batched(objects, model, batch_size):
+    return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def _count_rows(through):
+    return Coalesce(Subquery(
+        through.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(total=Count('*')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def seed(recipes=1000, users=50, tags=10, ingredients=200,
+         ingredients_per_recipe=5, tags_per_recipe=2, favorites_per_user=20,
+         subscriptions_per_user=5, batch_size=2000, random_seed=0):
+    """Fills the database with a synthetic dataset using bulk inserts."""
+    rng = random.Random(random_seed)
+    prefix = uuid4().hex[:8]
+    users = _batched([
+        User(
+            username=f'bench-{prefix}-{i}', email=f'{prefix}-{i}@bench.local',
+            password='!'
+        ) for i in range(users)
+    ], User, batch_size)
+    tags = _batched([
+        Tag(name=f'tag {i}', collor='#E26C2D', slug=f'bench-{prefix}-{i}')
+        for i in range(tags)
+    ], Tag, batch_size)
+    ingredients = _batched([
+        Ingredient(name=f'ingredient {prefix} {i}', measurement_unit='г')
+        for i in range(ingredients)
+    ], Ingredient, batch_size)
+
+    recipe_ids = []
+    author_recipes = defaultdict(list)
+    for start in range(0, recipes, batch_size):
+        created = _batched([
+            Recipe(
+                author=rng.choice(users), name=f'recipe {i}',
+                image='recipes/images/bench.png', text='text',
+                cooking_time=rng.randint(1, 180)
+            ) for i in range(start, min(start + batch_size, recipes))
+        ], Recipe, batch_size)
+        for recipe in created:
+            recipe_ids.append(recipe.id)
+            author_recipes[recipe.author_id].append(recipe.id)
+
+        TagThrough = Recipe.tags.through
+        _batched([
+            TagThrough(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipe_ids[start:]
+            for tag in rng.sample(tags, min(tags_per_recipe, len(tags)))
+        ], TagThrough, batch_size)
+        _batched([
+            UsableIngredient(
+                ingredient=ingredient, amount=rng.randint(1, 500),
+                recipe_id=recipe_id
+            )
+            for recipe_id in recipe_ids[start:]
+            for ingredient in rng.sample(
+                ingredients, min(ingredients_per_recipe, len(ingredients))
+            )
+        ], UsableIngredient, batch_size)
+
+    for through in (Recipe.favorite.through, Recipe.shopping_cart.through):
+        _batched([
+            through(recipe_id=recipe_id, user_id=user.id)
+            for user in users
+            for recipe_id in rng.sample(
+                recipe_ids, min(favorites_per_user, len(recipe_ids))
+            )
+        ], through, batch_size)
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        favorites_count=_count_rows(Recipe.favorite.through),
+        in_carts_count=_count_rows(Recipe.shopping_cart.through),
+    )
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            search_vector=search_document())
+
+    Subscription = User.subscribers.through
+    subscriptions = [
+        (user, author)
+        for user in users
+        for author in rng.sample(
+            [author for author in users if author != user],
+            min(subscriptions_per_user, len(users) - 1)
+        )
+    ]
+    _batched([
+        Subscription(from_user_id=author.id, to_user_id=user.id)
+        for user, author in subscriptions
+    ], Subscription, batch_size)
+    _batched([
+        FeedEntry(user_id=user.id, recipe_id=recipe_id)
+        for user, author in subscriptions
+        for recipe_id in author_recipes[author.id][
+            -settings.FEED_BACKFILL_SIZE:]
+    ], FeedEntry, batch_size)
+    return {'users': users, 'tags': tags, 'ingredients': ingredients}
+
+
+def measure(call, repeat=10, reset=None):
+    """Runs call() repeatedly and reports query count, latency and size.
+
+    ``queries`` is the largest count seen, which is the cold cache run.
+    ``reset()`` restores state between runs and is not measured.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = perf_counter()
+            response = call()
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+            timings.append((perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+        if reset is not None:
+            reset()
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50': median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'bytes': len(content),
+    }
+
+
+class Scenario(NamedTuple):
+    method: str
+    path: str
+    status: int = 200
+    data: Any = None
+    anonymous: bool = False
+    reset: Callable = None
+
+
+def scenarios(data):
+    """One or more requests for every route of the API.
+
+    Reads come first, writes undo themselves through ``reset`` so every
+    run of a scenario starts from the same state. ``data`` may be a
+    callable returning the request body of each run.
+    """
+    user, author = data['users'][:2]
+    tag = data['tags'][0]
+    ingredient = data['ingredients'][0]
+    recipe = Recipe.objects.filter(author=author).order_by('id').first()
+    own = Recipe.objects.filter(author=user).order_by('id').first()
+    token = Token.objects.get(user=user)
+    Subscription = User.subscribers.through
+    counter = iter(range(10 ** 9))
+
+    def recipe_payload(**kwargs):
+        return {
+            'name': 'bench recipe', 'text': 'text', 'cooking_time': 10,
+            'image': IMAGE, 'tags': [tag.id],
+            'ingredients': [{'id': ingredient.id, 'amount': 10}], **kwargs
+        }
+
+    batch = list(
+        Recipe.objects.order_by('id').values_list('id', flat=True)[:10])
+
+    def unmark(through, ids=None):
+        return lambda: through.objects.filter(
+            recipe_id__in=ids or [recipe.id], user=user).delete()
+
+    def mark(through, ids=None):
+        def reset():
+            unmark(through, ids)()
+            through.objects.bulk_create([
+                through(recipe_id=id, user=user) for id in ids or [recipe.id]
+            ])
+        return reset
+
+    def new_user():
+        number = next(counter)
+        return {
+            'username': f'bench-new-{number}',
+            'email': f'new-{number}@bench.local', 'password': PASSWORD
+        }
+
+    def restore_password():
+        user.set_password(PASSWORD)
+        user.save(update_fields=['password'])
+
+    return {
+        'api root': Scenario('get', '/api/'),
+        'tag list': Scenario('get', '/api/tags/'),
+        'tag detail': Scenario('get', f'/api/tags/{tag.id}/'),
+        'ingredient list': Scenario('get', '/api/ingredients/'),
+        'ingredient search': Scenario(
+            'get', f'/api/ingredients/?name={ingredient.name[:12]}'),
+        'ingredient detail': Scenario(
+            'get', f'/api/ingredients/{ingredient.id}/'),
+        'recipe list': Scenario('get', '/api/recipes/'),
+        'recipe list anonymous': Scenario(
+            'get', '/api/recipes/', anonymous=True),
+        'recipe list filtered': Scenario(
+            'get', f'/api/recipes/?tags={tag.slug}&is_favorited=1'
+            '&cooking_time_max=120'),
+        'recipe list popular': Scenario(
+            'get', '/api/recipes/?ordering=-popularity'),
+        'recipe list cursor': Scenario('get', '/api/recipes/?cursor='),
+        'recipe search': Scenario('get', '/api/recipes/?search=recipe'),
+        'recipe detail': Scenario('get', f'/api/recipes/{recipe.id}/'),
+        'recipe feed': Scenario('get', '/api/recipes/feed/'),
+        'shopping cart txt': Scenario(
+            'get', '/api/recipes/download_shopping_cart/'),
+        'shopping cart csv': Scenario(
+            'get', '/api/recipes/download_shopping_cart/?format=csv'),
+        'subscriptions': Scenario('get', '/api/users/subscriptions/'),
+        'user list': Scenario('get', '/api/users/'),
+        'user detail': Scenario('get', f'/api/users/{author.id}/'),
+        'user me': Scenario('get', '/api/users/me/'),
+        'recipe create': Scenario(
+            'post', '/api/recipes/', 201, recipe_payload,
+            reset=lambda: Recipe.objects.filter(
+                author=user, name='bench recipe').delete()),
+        'recipe update': Scenario(
+            'patch', f'/api/recipes/{own.id}/', 200,
+            recipe_payload(name=own.name)),
+        'recipe delete': Scenario(
+            'delete', f'/api/recipes/{own.id}/', 204,
+            reset=lambda: Recipe.objects.bulk_create([own])),
+        'favorite add': Scenario(
+            'post', f'/api/recipes/{recipe.id}/favorite/', 201,
+            reset=unmark(Recipe.favorite.through)),
+        'favorite remove': Scenario(
+            'delete', f'/api/recipes/{recipe.id}/favorite/', 204,
+            reset=mark(Recipe.favorite.through)),
+        'shopping cart add': Scenario(
+            'post', f'/api/recipes/{recipe.id}/shopping_cart/', 201,
+            reset=unmark(Recipe.shopping_cart.through)),
+        'shopping cart remove': Scenario(
+            'delete', f'/api/recipes/{recipe.id}/shopping_cart/', 204,
+            reset=mark(Recipe.shopping_cart.through)),
+        'favorite batch add': Scenario(
+            'post', '/api/recipes/favorite/', 201, {'ids': batch},
+            reset=unmark(Recipe.favorite.through, batch)),
+        'favorite batch remove': Scenario(
+            'delete', '/api/recipes/favorite/', 200, {'ids': batch},
+            reset=mark(Recipe.favorite.through, batch)),
+        'shopping cart batch add': Scenario(
+            'post', '/api/recipes/shopping_cart/', 201, {'ids': batch},
+            reset=unmark(Recipe.shopping_cart.through, batch)),
+        'shopping cart batch remove': Scenario(
+            'delete', '/api/recipes/shopping_cart/', 200, {'ids': batch},
+            reset=mark(Recipe.shopping_cart.through, batch)),
+        'subscribe': Scenario(
+            'post', f'/api/users/{author.id}/subscribe/', 201,
+            reset=lambda: Subscription.objects.filter(
+                from_user=author, to_user=user).delete()),
+        'unsubscribe': Scenario(
+            'delete', f'/api/users/{author.id}/subscribe/', 204,
+            reset=lambda: Subscription.objects.get_or_create(
+                from_user=author, to_user=user)),
+        'user create': Scenario(
+            'post', '/api/users/', 201, new_user, anonymous=True),
+        'set password': Scenario(
+            'post', '/api/users/set_password/', 200, {
+                'current_password': PASSWORD, 'new_password': PASSWORD
+            }, reset=restore_password),
+        'token login': Scenario(
+            'post', '/api/auth/token/login/', 200, {
+                'email': user.email, 'password': PASSWORD
+            }, anonymous=True),
+        'token logout': Scenario(
+            'post', '/api/auth/token/logout/', 204,
+            reset=lambda: Token.objects.get_or_create(
+                user=user, key=token.key)),
+    }
+
+
+def prepare(data):
+    """Gives the benchmark user a password, a token and a recipe."""
+    user, author = data['users'][:2]
+    user.set_password(PASSWORD)
+    user.save(update_fields=['password'])
+    Token.objects.get_or_create(user=user)
+    if not Recipe.objects.filter(author=author).exists():
+        Recipe.objects.filter(
+            id=Recipe.objects.order_by('id').values('id')[:1]
+        ).update(author=author)
+    recipe = Recipe.objects.filter(author=author).first()
+    Recipe.objects.create(
+        author=user, name='own recipe', image=recipe.image, text='text',
+        cooking_time=10
+    )
+    User.subscribers.through.objects.get_or_create(
+        from_user=author, to_user=user)
+
+
+def run_scenario(scenario, token, repeat=10):
+    client = APIClient()
+    if not scenario.anonymous:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    send = getattr(client, scenario.method)
+    # Measure the cold run from scratch, token lookup included, on a
+    # private cache: the configured one may be shared with live servers.
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        invalidate_token(token.key)
+        cache.clear()
+        return measure(
+            lambda: send(
+                scenario.path,
+                scenario.data() if callable(scenario.data) else scenario.data,
+                format='json'
+            ),
+            repeat, scenario.reset
+        )
+
+
+def serialization_throughput(ids, request, repeat=5):
+    """Recipes per second of the read paths, rendering included.
+
+    Compares ``RecipeSerializer`` with the ``.values()`` representations
+    and DRF's JSON renderer with the orjson one.
+    """
+    view = RecipeViewSet(request=request, format_kwarg=None, kwargs={})
+    queryset = view.get_queryset(AnonymousUser()).filter(id__in=ids)
+
+    def serialize():
+        return RecipeSerializer(
+            queryset, many=True, context={'request': request}).data
+
+    def build():
+        return list(load_recipes(ids, request.build_absolute_uri).values())
+
+    results = {}
+    for loader, load in (('serializer', serialize), ('values', build)):
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            timings = []
+            for _ in range(repeat):
+                start = perf_counter()
+                renderer.render(load())
+                timings.append(perf_counter() - start)
+            name = f'{loader} + {type(renderer).__name__}'
+            results[name] = len(ids) / median(timings)
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path) as file:
+        return json.load(file)
+
+
+def check_budget(result, budget, metrics=None):
+    """Lists the metrics of ``result`` that exceed ``budget``.
+
+    ``metrics`` restricts the check to the given names.
+    """
+    return [
+        f'{metric} {result[metric]:g} > {limit:g}'
+        for metric, limit in budget.items()
+        if (metrics is None or metric in metrics) and result[metric] > limit
+    ]
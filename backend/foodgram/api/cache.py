@@ -0,0 +1,256 @@
+"""Cache for recipe representations and per-user recipe flags.
+
+A recipe is cached once for everybody: the serialized representation is
+stored under its id, a per-recipe version and a catalog generation, and
+the user-specific fields (``is_favorited``, ``is_in_shopping_cart`` and
+``author.is_subscribed``) are filled in from a small set of ids cached per
+user. Writers never overwrite entries, they only bump versions, so a
+reader that raced with a write stores its result under a version nobody
+asks for again.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from threading import Lock
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram import metrics
+from foodgram.db import use_primary
+from users.models import User
+from .models import Ingredient, Recipe, Tag, UsableIngredient
+
+GENERATION_KEY = 'recipes:generation'
+RECIPES_VERSION_KEY = 'recipes:version'
+RECIPE_COUNTERS_VERSION_KEY = 'recipes:counters:version'
+TAGS_VERSION_KEY = 'tags:version'
+INGREDIENTS_VERSION_KEY = 'ingredients:version'
+
+stats = Counter()
+_stats_lock = Lock()
+
+
+def count(name, value=1):
+    with _stats_lock:
+        stats[name] += value
+
+
+def collect_stats():
+    with _stats_lock:
+        return {(name,): value for name, value in stats.items()}
+
+
+metrics.Collected(
+    'foodgram_cache_events_total',
+    'Hits and misses of the recipe, user flag and catalog caches.',
+    ('event',), collect_stats
+)
+
+
+def new_version():
+    return f'{time():.6f}-{uuid4().hex[:12]}'
+
+
+def version_time(version):
+    """When a version was issued; versions are never older than the data."""
+    try:
+        return datetime.fromtimestamp(
+            float(version.split('-')[0]), timezone.utc)
+    except ValueError:
+        return datetime.now(timezone.utc)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, new_version(), None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+def bump_versions(keys):
+    """Move the given version keys once the current transaction commits."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({key: new_version() for key in keys}, None)
+        )
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe:{recipe_id}:version'
+
+
+def user_version_key(user_id):
+    return f'user:{user_id}:version'
+
+
+def get_recipes(ids, load, base_url=''):
+    """Return representations for ``ids`` in order, skipping missing ones.
+
+    ``load`` receives the ids that are not cached and returns a mapping of
+    id to representation.
+    """
+    version_keys = {id: recipe_version_key(id) for id in ids}
+    versions = get_versions(
+        [GENERATION_KEY] + list(version_keys.values()))
+    generation = versions[GENERATION_KEY]
+    keys = {
+        id: f'recipe:{id}:{generation}:{versions[key]}:{base_url}'
+        for id, key in version_keys.items()
+    }
+    found = cache.get_many(list(keys.values()))
+    missing = [id for id, key in keys.items() if key not in found]
+    count('recipe_hits', len(keys) - len(missing))
+    count('recipe_misses', len(missing))
+    if missing:
+        with use_primary():
+            loaded = load(missing)
+        cache.set_many(
+            {keys[id]: data for id, data in loaded.items()},
+            settings.RECIPE_CACHE_TIMEOUT
+        )
+        found.update({keys[id]: data for id, data in loaded.items()})
+    return [found[keys[id]] for id in ids if keys[id] in found]
+
+
+def get_user_flags(user):
+    """Ids of the recipes and authors the user has marked."""
+    if not user.is_authenticated:
+        return {
+            'favorites': frozenset(), 'shopping_cart': frozenset(),
+            'subscriptions': frozenset()
+        }
+    version_key = user_version_key(user.id)
+    versions = get_versions([GENERATION_KEY, version_key])
+    key = (
+        f'user:{user.id}:flags:{versions[GENERATION_KEY]}:'
+        f'{versions[version_key]}'
+    )
+    flags = cache.get(key)
+    if flags is not None:
+        count('user_flags_hits')
+        return flags
+    count('user_flags_misses')
+    with use_primary():
+        flags = {
+            'favorites': frozenset(
+                user.favorites.values_list('id', flat=True)),
+            'shopping_cart': frozenset(
+                user.shopping_cart.values_list('id', flat=True)),
+            'subscriptions': frozenset(
+                user.subscriptions.values_list('id', flat=True)),
+        }
+    cache.set(key, flags, settings.RECIPE_CACHE_TIMEOUT)
+    return flags
+
+
+def apply_user_flags(data, flags):
+    data['is_favorited'] = data['id'] in flags['favorites']
+    data['is_in_shopping_cart'] = data['id'] in flags['shopping_cart']
+    data['author']['is_subscribed'] = (
+        data['author']['id'] in flags['subscriptions'])
+    return data
+
+
+def get_catalog(version_key, name, build):
+    """Cache the result of ``build`` until ``version_key`` is bumped."""
+    key = f'{name}:{get_version(version_key)}'
+    data = cache.get(key)
+    if data is not None:
+        count(f'{name}_hits')
+        return data
+    count(f'{name}_misses')
+    with use_primary():
+        data = build()
+    cache.set(key, data, None)
+    return data
+
+
+def invalidate_recipes(ids):
+    bump_versions(
+        [RECIPES_VERSION_KEY] + [recipe_version_key(id) for id in ids])
+
+
+def invalidate_recipe_counters(ids):
+    """Refresh the recipes' own entries after their counters changed.
+
+    Counts are shown and sorted on in every list, so the counters version
+    moves together with the recipes' own versions.
+    """
+    bump_versions(
+        [RECIPE_COUNTERS_VERSION_KEY] + [recipe_version_key(id) for id in ids])
+
+
+def invalidate_users(ids):
+    bump_versions(user_version_key(id) for id in ids)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    invalidate_recipes([instance.id])
+
+
+@receiver(post_save, sender=UsableIngredient)
+@receiver(post_delete, sender=UsableIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.id])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+    else:
+        bump_versions([GENERATION_KEY])
+
+
+@receiver(m2m_changed, sender=Recipe.favorite.through)
+@receiver(m2m_changed, sender=Recipe.shopping_cart.through)
+@receiver(m2m_changed, sender=User.subscribers.through)
+def user_flags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        invalidate_users([instance.id])
+    elif pk_set:
+        invalidate_users(pk_set)
+    else:
+        bump_versions([GENERATION_KEY])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(**kwargs):
+    bump_versions([TAGS_VERSION_KEY, GENERATION_KEY])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(**kwargs):
+    bump_versions([INGREDIENTS_VERSION_KEY, GENERATION_KEY])
+
+
+@receiver(post_save, sender=User)
+def user_changed(created, update_fields=None, **kwargs):
+    if created or (
+        update_fields is not None and set(update_fields) <= {'password'}
+    ):
+        return
+    bump_versions([GENERATION_KEY])
@@ -0,0 +1,83 @@
+"""Conditional GET for the read endpoints.
+
+ETags are built from version stamps that are cheap to read: the cache
+versions bumped by :mod:`api.cache` and ``Recipe.updated_at``. A matching
+``If-None-Match`` is answered with 304 before the queryset is evaluated.
+"""
+from hashlib import sha1
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache import (
+    GENERATION_KEY, RECIPE_COUNTERS_VERSION_KEY, RECIPES_VERSION_KEY,
+    get_versions, user_version_key, version_time
+)
+from .models import Recipe
+
+
+def get_etag(request, state):
+    parts = [
+        request.build_absolute_uri(), request.accepted_media_type, *state[0]
+    ]
+    return sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def conditional(get_state):
+    """Decorate a view method with ETag and Last-Modified from ``get_state``.
+
+    ``get_state(request, **kwargs)`` returns a list of version parts and the
+    last modification time, or ``None`` to skip the check.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, 'version_state'):
+            request.version_state = get_state(request, **kwargs)
+        return request.version_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        return get_etag(request, current)
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        return current and current[1]
+
+    return method_decorator(condition(etag, last_modified))
+
+
+def catalog_state(version_key):
+    def get_state(request, **kwargs):
+        version = get_versions([version_key])[version_key]
+        return [version], version_time(version)
+    return get_state
+
+
+def recipe_list_state(request, **kwargs):
+    keys = [GENERATION_KEY, RECIPES_VERSION_KEY, RECIPE_COUNTERS_VERSION_KEY]
+    if request.user.is_authenticated:
+        keys.append(user_version_key(request.user.id))
+    versions = get_versions(keys)
+    return (
+        [versions[key] for key in keys],
+        max(version_time(version) for version in versions.values())
+    )
+
+
+def recipe_state(request, pk=None, **kwargs):
+    try:
+        updated_at = Recipe.objects.filter(pk=pk).values_list(
+            'updated_at', flat=True).first()
+    except ValueError:
+        return None
+    if updated_at is None:
+        return None
+    keys = [GENERATION_KEY]
+    if request.user.is_authenticated:
+        keys.append(user_version_key(request.user.id))
+    versions = get_versions(keys)
+    return (
+        [updated_at.isoformat()] + [versions[key] for key in keys],
+        max(updated_at, *map(version_time, versions.values()))
+    )
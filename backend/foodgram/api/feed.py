@@ -0,0 +1,91 @@
+"""Follow feed: recipes of the authors a user is subscribed to.
+
+New recipes are written into ``FeedEntry`` rows of every follower by a
+background task. Authors with more than ``FEED_FANOUT_MAX_FOLLOWERS``
+followers are not fanned out; their recipes are flagged with
+``feed_pull`` and merged into feeds at read time.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import User
+from .models import FeedEntry, Recipe
+
+Subscription = User.subscribers.through
+
+
+def _write_entries(pairs):
+    pairs = iter(pairs)
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in batch
+        ], ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).only('author_id').first()
+    if recipe is None:
+        return
+    followers = (
+        Subscription.objects.filter(from_user_id=recipe.author_id)
+        .order_by('id').values_list('to_user_id', flat=True)
+    )
+    if followers[settings.FEED_FANOUT_MAX_FOLLOWERS:].exists():
+        Recipe.objects.filter(id=recipe_id).update(feed_pull=True)
+        return
+    _write_entries(
+        (user_id, recipe_id)
+        for user_id in followers.iterator(
+            chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Copies the author's latest recipes into a new follower's feed.
+
+    Runs in the background once the subscription is committed. The
+    subscription row stays locked while entries are written, so a
+    concurrent unsubscribe either finds them to remove or is seen here.
+    """
+    with transaction.atomic():
+        subscribed = list(
+            Subscription.objects.select_for_update()
+            .filter(from_user_id=author_id, to_user_id=user_id)
+            .values_list('id', flat=True)
+        )
+        if not subscribed:
+            return
+        recipes = (
+            Recipe.objects.filter(author_id=author_id, feed_pull=False)
+            .order_by('-id').values_list('id', flat=True)
+            [:settings.FEED_BACKFILL_SIZE]
+        )
+        _write_entries((user_id, recipe_id) for recipe_id in recipes)
+
+
+def remove_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def get_feed(user):
+    """Recipes in the user's feed.
+
+    Their ids are the union of two indexed lookups, the user's entries and
+    the pulled recipes of followed authors, so recipes are only read by
+    primary key.
+    """
+    entries = FeedEntry.objects.filter(user=user).order_by().values(
+        'recipe_id')
+    pulled = Recipe.objects.filter(
+        feed_pull=True, author_id__in=Subscription.objects.filter(
+            to_user=user).values('from_user_id')
+    ).order_by().values('id')
+    return Recipe.objects.filter(id__in=entries.union(pulled, all=True))
@@ -0,0 +1,65 @@
+import base64
+import binascii
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from drf_base64.fields import Base64ImageField
+from rest_framework import serializers
+
+
+class RecipeImageField(Base64ImageField):
+    """Base64 image field with size limits and content-hashed file names.
+
+    The encoded length is checked before decoding, so oversized uploads are
+    rejected without allocating the decoded image, and the pixel count is
+    checked before Pillow decodes the bitmap.
+    """
+    default_error_messages = {
+        'too_large': 'Image is too large.',
+        'invalid_base64': 'Image is not valid base64.',
+    }
+
+    def _decode(self, data):
+        if not (isinstance(data, str) and data.startswith('data:')):
+            return super()._decode(data)
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(data) > max_size * 4 // 3 + 128:
+            self.fail('too_large')
+        try:
+            header, encoded = data.split(';base64,')
+            content = base64.b64decode(encoded, validate=True)
+        except (ValueError, binascii.Error):
+            self.fail('invalid_base64')
+        if len(content) > max_size:
+            self.fail('too_large')
+        extension = header.split('/')[-1][:4].lower()
+        return ContentFile(
+            content, name=f'{sha256(content).hexdigest()[:32]}.{extension}'
+        )
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        image = getattr(file, 'image', None)
+        if (
+            image is not None and
+            image.width * image.height > settings.RECIPE_IMAGE_MAX_PIXELS
+        ):
+            self.fail('too_large')
+        return file
+
+
+class ImageVariantField(serializers.ImageField):
+    """Read-only URL of a generated variant, or of the original until the
+    variant is ready."""
+
+    def __init__(self, fallback='image', **kwargs):
+        self.fallback = fallback
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return (
+            super().get_attribute(instance) or
+            getattr(instance, self.fallback)
+        )
@@ -0,0 +1,83 @@
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Recipe
+from .search import search_recipes
+
+
+class RecipeFilterBackend(BaseFilterBackend):
+    """Filters recipes by tags, author, cooking time and user flags.
+
+    Every filter is a plain WHERE condition, so the result is one query
+    that can still be counted, ordered and paginated. ``?ordering=`` picks
+    one of ``ORDERINGS``, each backed by an index. ``?search=`` results are
+    ordered by relevance unless another ordering is asked for.
+    """
+    ORDERINGS = {
+        '-id': ('-id',),
+        'id': ('id',),
+        '-popularity': ('-favorites_count', '-id'),
+        'popularity': ('favorites_count', 'id'),
+        'relevance': ('-search_rank', '-id'),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        search = self.get_search(params)
+        if search:
+            queryset = search_recipes(queryset, search)
+        tags = params.getlist('tags')
+        if tags:
+            queryset = queryset.filter(Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag__slug__in=tags
+                )
+            ))
+        if 'author' in params:
+            queryset = queryset.filter(
+                author_id=self.get_integer(params, 'author'))
+        if 'cooking_time_min' in params:
+            queryset = queryset.filter(
+                cooking_time__gte=self.get_integer(params, 'cooking_time_min'))
+        if 'cooking_time_max' in params:
+            queryset = queryset.filter(
+                cooking_time__lte=self.get_integer(params, 'cooking_time_max'))
+        if self.get_flag(params, 'is_favorited'):
+            queryset = self.filter_marked(
+                queryset, Recipe.favorite.through, request.user)
+        if self.get_flag(params, 'is_in_shopping_cart'):
+            queryset = self.filter_marked(
+                queryset, Recipe.shopping_cart.through, request.user)
+        return queryset.order_by(*self.get_ordering(request, queryset, view))
+
+    def get_ordering(self, request, queryset, view):
+        # Also used by cursor pagination to order its pages.
+        search = self.get_search(request.query_params)
+        ordering = request.query_params.get(
+            'ordering', 'relevance' if search else '-id')
+        if ordering not in self.ORDERINGS:
+            raise ParseError(
+                f"ordering must be one of {', '.join(self.ORDERINGS)}.")
+        if ordering == 'relevance' and not search:
+            raise ParseError('ordering=relevance requires search.')
+        return self.ORDERINGS[ordering]
+
+    def get_search(self, params):
+        return params.get('search', '').strip()
+
+    def filter_marked(self, queryset, through, user):
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(
+            through.objects.filter(recipe=OuterRef('pk'), user=user)
+        ))
+
+    def get_integer(self, params, name):
+        try:
+            return int(params.get(name))
+        except ValueError:
+            raise ParseError(f'{name} must be an integer.')
+
+    def get_flag(self, params, name):
+        return params.get(name, '0').lower() in ('1', 'true')
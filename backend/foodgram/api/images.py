@@ -0,0 +1,50 @@
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image
+
+from .cache import invalidate_recipes
+from .models import Recipe
+
+
+def _to_webp(image, size=None):
+    if size is not None:
+        image.thumbnail(size)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=settings.RECIPE_IMAGE_WEBP_QUALITY)
+    content = buffer.getvalue()
+    return ContentFile(
+        content, name=f'{sha256(content).hexdigest()[:32]}.webp'
+    )
+
+
+def generate_image_variants(recipe_id):
+    """Stores a WebP copy and a WebP thumbnail of the recipe image."""
+    recipe = Recipe.objects.filter(id=recipe_id).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        webp = _to_webp(image)
+        thumbnail = _to_webp(image, settings.RECIPE_THUMBNAIL_SIZE)
+    storage = recipe.image.storage
+    updated = Recipe.objects.filter(id=recipe_id, image=source).update(
+        image_webp=storage.save(
+            Recipe.image_webp.field.generate_filename(recipe, webp.name),
+            webp
+        ),
+        image_thumbnail=storage.save(
+            Recipe.image_thumbnail.field.generate_filename(
+                recipe, thumbnail.name),
+            thumbnail
+        ),
+        updated_at=timezone.now(),
+    )
+    if updated:
+        invalidate_recipes([recipe_id])
@@ -0,0 +1,73 @@
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import (
+    check_budget, load_budgets, prepare, run_scenario, scenarios, seed
+)
+
+
+class Command(BaseCommand):
+    help = 'Measures query counts, latency and response size of every route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int)
+        parser.add_argument('--users', type=int)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            'scenarios', nargs='*', help='Run only these scenarios')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail when a query count, latency or size exceeds its budget'
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated data instead of rolling it back'
+        )
+
+    def handle(self, *args, **options):
+        budgets = load_budgets()
+        dataset = dict(budgets['dataset'])
+        for name in ('recipes', 'users'):
+            if options[name] is not None:
+                dataset[name] = options[name]
+        with TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media
+        ), transaction.atomic():
+            over = self.run(dataset, budgets['endpoints'], options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+        if over and options['check']:
+            raise CommandError(f"Over budget: {', '.join(over)}")
+
+    def run(self, dataset, budgets, options):
+        self.stdout.write(f"Seeding {dataset['recipes']} recipes...")
+        data = seed(**dataset)
+        prepare(data)
+        token = Token.objects.get(user=data['users'][0])
+        self.stdout.write(
+            f"{'scenario':<24}{'status':>8}{'queries':>9}{'budget':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}"
+        )
+        over = []
+        for name, scenario in scenarios(data).items():
+            if options['scenarios'] and name not in options['scenarios']:
+                continue
+            result = run_scenario(scenario, token, options['repeat'])
+            budget = budgets.get(name)
+            failures = (
+                ['no budget'] if budget is None
+                else check_budget(result, budget)
+            )
+            if failures:
+                over.append(f"{name} ({', '.join(failures)})")
+            self.stdout.write(
+                f"{name:<24}{result['status']:>8}{result['queries']:>9}"
+                f"{budget['queries'] if budget is not None else '-':>8}"
+                f"{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                f"{result['bytes']:>10}"
+            )
+        return over
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, seed
+
+
+class Command(BaseCommand):
+    help = 'Measures query counts and latency of recipe list filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated data instead of rolling it back'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def run(self, options):
+        self.stdout.write(f"Seeding {options['recipes']} recipes...")
+        data = seed(recipes=options['recipes'])
+        user = data['users'][0]
+        tags = [tag.slug for tag in data['tags']]
+        client = APIClient()
+        client.force_authenticate(user)
+
+        scenarios = {
+            'list': '',
+            'one tag': f'?tags={tags[0]}',
+            'two tags': f'?tags={tags[0]}&tags={tags[1]}',
+            'author': f'?author={user.id}',
+            'cooking time': '?cooking_time_min=10&cooking_time_max=30',
+            'is_favorited': '?is_favorited=1',
+            'is_in_shopping_cart': '?is_in_shopping_cart=1',
+            'combined': (
+                f'?tags={tags[0]}&tags={tags[1]}&is_favorited=1'
+                '&cooking_time_max=120'
+            ),
+            'deep page': '?page=500',
+        }
+        self.stdout.write(
+            f"{'scenario':<22}{'status':>8}{'queries':>9}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}"
+        )
+        for name, query in scenarios.items():
+            result = measure(
+                lambda: client.get(f'/api/recipes/{query}'),
+                options['repeat']
+            )
+            self.stdout.write(
+                f"{name:<22}{result['status']:>8}{result['queries']:>9}"
+                f"{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                f"{result['bytes']:>10}"
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import seed, serialization_throughput
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Compares recipe serialization and rendering throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed(recipes=options['recipes'])
+            ids = list(
+                Recipe.objects.order_by('-id').values_list('id', flat=True)
+                [:options['recipes']]
+            )
+            request = Request(APIRequestFactory().get('/api/recipes/'))
+            results = serialization_throughput(
+                ids, request, options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write(f"{'read path':<36}{'recipes/s':>12}")
+        for name, rate in results.items():
+            self.stdout.write(f'{name:<36}{rate:>12.0f}')
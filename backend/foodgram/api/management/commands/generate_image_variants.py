@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_image_variants
+from api.management.shared_cache import (
+    add_local_cache_argument, require_shared_cache
+)
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generates WebP and thumbnail variants for recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate variants that already exist'
+        )
+        add_local_cache_argument(parser)
+
+    def handle(self, *args, **options):
+        require_shared_cache(options)
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_thumbnail='')
+        count = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            generate_image_variants(recipe_id)
+            count += 1
+        self.stdout.write(f'Processed {count} recipes')
@@ -0,0 +1,106 @@
+import csv
+from json import JSONDecodeError, JSONDecoder
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.autocomplete import ingredient_index
+from api.management.shared_cache import (
+    add_local_cache_argument, require_shared_cache
+)
+from api.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def read_json(file):
+    """Yields the objects of a top-level JSON array without reading it all."""
+    decoder = JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Expected a JSON array.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] in ',]':
+                position += 1
+                continue
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Truncated JSON input.')
+                break
+            yield item
+        if not chunk:
+            return
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        if len(row) != 2:
+            raise CommandError(f'Expected name and unit, got {row!r}.')
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+class Command(BaseCommand):
+    help = 'Loads ingredients from a JSON or CSV file, skipping known ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=Path(settings.BASE_DIR) / 'foodgram' / 'ingredients.json'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        add_local_cache_argument(parser)
+
+    def handle(self, *args, **options):
+        require_shared_cache(options)
+        path = Path(options['path'])
+        reader = read_csv if path.suffix.lower() == '.csv' else read_json
+        batch_size = options['batch_size']
+        before = Ingredient.objects.count()
+        started = perf_counter()
+        rows = 0
+        batch = []
+        with path.open(encoding='utf-8', newline='') as file:
+            for item in reader(file):
+                batch.append(Ingredient(
+                    name=item['name'].strip(),
+                    measurement_unit=item['measurement_unit'].strip()
+                ))
+                if len(batch) == batch_size:
+                    rows += self.write(batch)
+                    batch = []
+            rows += self.write(batch)
+        elapsed = perf_counter() - started
+        created = Ingredient.objects.count() - before
+        if created:
+            ingredient_index.invalidate()
+        self.stdout.write(
+            f'Read {rows} rows, created {created} ingredients in '
+            f'{elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)'
+        )
+
+    def write(self, batch):
+        # Every column is part of the unique constraint, so there is nothing
+        # to update on conflict and existing rows are simply kept.
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram.profiling import header_value
+
+
+class Command(BaseCommand):
+    help = 'Prints an X-Profile header value that makes a request profiled'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'X-Profile: {header_value()}')
+        self.stderr.write(
+            f'Valid for {settings.PROFILING_HEADER_MAX_AGE} seconds; '
+            f'profiles are written to {settings.PROFILING_DIR}'
+        )
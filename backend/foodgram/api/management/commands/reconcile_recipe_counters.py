@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from api.cache import invalidate_recipe_counters
+from api.management.shared_cache import (
+    add_local_cache_argument, require_shared_cache
+)
+from api.models import Recipe
+
+COUNTERS = {
+    'favorites_count': Recipe.favorite.through,
+    'in_carts_count': Recipe.shopping_cart.through,
+}
+
+
+class Command(BaseCommand):
+    help = 'Recomputes favorite and shopping cart counters of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        add_local_cache_argument(parser)
+
+    def handle(self, *args, **options):
+        require_shared_cache(options)
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            with transaction.atomic():
+                recipes = list(
+                    Recipe.objects.select_for_update()
+                    .filter(id__gt=last_id).order_by('id')
+                    .only('id', *COUNTERS)[:batch_size]
+                )
+                if not recipes:
+                    break
+                last_id = recipes[-1].id
+                drifted = self.reconcile(recipes)
+                Recipe.objects.bulk_update(
+                    drifted, [*COUNTERS, 'updated_at'])
+                invalidate_recipe_counters(
+                    [recipe.id for recipe in drifted])
+            checked += len(recipes)
+            fixed += len(drifted)
+        self.stdout.write(f'Checked {checked} recipes, fixed {fixed}')
+
+    def reconcile(self, recipes):
+        ids = [recipe.id for recipe in recipes]
+        actual = {
+            field: dict(
+                through.objects.filter(recipe_id__in=ids)
+                .values('recipe_id').annotate(total=Count('*'))
+                .order_by().values_list('recipe_id', 'total')
+            )
+            for field, through in COUNTERS.items()
+        }
+        now = timezone.now()
+        drifted = []
+        for recipe in recipes:
+            changed = False
+            for field in COUNTERS:
+                value = actual[field].get(recipe.id, 0)
+                if getattr(recipe, field) != value:
+                    setattr(recipe, field, value)
+                    changed = True
+            if changed:
+                recipe.updated_at = now
+                drifted.append(recipe)
+        return drifted
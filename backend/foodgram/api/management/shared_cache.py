@@ -0,0 +1,28 @@
+"""Guard for commands whose writes invalidate caches read by the servers.
+
+Commands run in their own process. With a process-local cache backend
+their version bumps never reach the servers, which keep serving the old
+data: catalogs and the autocomplete index are cached without a timeout.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import CommandError
+
+
+def add_local_cache_argument(parser):
+    parser.add_argument(
+        '--allow-local-cache', action='store_true',
+        help='Run although the cache is local to this process; restart the '
+             'servers afterwards'
+    )
+
+
+def require_shared_cache(options):
+    if options['allow_local_cache']:
+        return
+    if isinstance(caches['default'], LocMemCache):
+        raise CommandError(
+            'The default cache is local to each process, so running servers '
+            'would keep serving cached data. Set REDIS_URL, or pass '
+            '--allow-local-cache and restart the servers afterwards.'
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 4.1 on 2026-10-18 18:42
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+from foodgram.migration_operations import AddIndexOnline, AlterFieldOnline
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0002_initial'),
+    ]
+
+    operations = [
+        AlterFieldOnline(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(unique=True),
+        ),
+        AddIndexOnline(
+            model_name='ingredient',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='ingredient_upper_name_idx'),
+        ),
+        AddIndexOnline(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Min, Sum
+
+BATCH_SIZE = 1000
+
+
+def resolve_ingredient(Ingredient, db, row):
+    ingredient = Ingredient.objects.using(db).filter(
+        name=row.name, measurement_unit=row.measurement_unit
+    ).order_by('id').first()
+    if ingredient is None:
+        ingredient = Ingredient.objects.using(db).create(
+            name=row.name, measurement_unit=row.measurement_unit
+        )
+    return ingredient.id
+
+
+def backfill_ingredients(apps, schema_editor):
+    """Points every row at an existing catalog entry, batch by batch.
+
+    Rows whose ingredient_id no longer exists in the catalog are matched by
+    their copied name and unit (or get a new catalog entry), so the column
+    can become a foreign key. Each batch commits on its own to keep locks
+    short on a live table.
+    """
+    Ingredient = apps.get_model('api', 'Ingredient')
+    UsableIngredient = apps.get_model('api', 'UsableIngredient')
+    db = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                UsableIngredient.objects.using(db)
+                .filter(id__gt=last_id).order_by('id')[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            last_id = batch[-1].id
+            known = set(
+                Ingredient.objects.using(db)
+                .filter(id__in={row.ingredient_id for row in batch})
+                .values_list('id', flat=True)
+            )
+            orphans = [row for row in batch if row.ingredient_id not in known]
+            for row in orphans:
+                row.ingredient_id = resolve_ingredient(Ingredient, db, row)
+            UsableIngredient.objects.using(db).bulk_update(
+                orphans, ['ingredient_id'])
+
+
+def merge_duplicates(apps, schema_editor):
+    UsableIngredient = apps.get_model('api', 'UsableIngredient')
+    db = schema_editor.connection.alias
+    duplicates = (
+        UsableIngredient.objects.using(db)
+        .values('recipe_id', 'ingredient_id')
+        .annotate(rows=Count('id'), keep_id=Min('id'), total=Sum('amount'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates.iterator():
+        with transaction.atomic(using=db):
+            UsableIngredient.objects.using(db).filter(
+                id=duplicate['keep_id']).update(amount=duplicate['total'])
+            UsableIngredient.objects.using(db).filter(
+                recipe_id=duplicate['recipe_id'],
+                ingredient_id=duplicate['ingredient_id'],
+            ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0003_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ingredients, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+from foodgram.migration_operations import AlterFieldOnline
+
+
+class Migration(migrations.Migration):
+    """Turns UsableIngredient.ingredient_id into a foreign key.
+
+    ingredient_id already holds catalog ids, so the column is reused as
+    is: first only the state learns about the foreign key, then the index
+    and the constraint are added without blocking writes. On PostgreSQL
+    the column keeps its integer type: widening it to bigint would rewrite
+    the table, and catalog ids stay far below 2**31.
+    """
+    atomic = False
+
+    dependencies = [
+        ('api', '0004_backfill_usableingredient'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='usableingredient',
+                    name='ingredient_id',
+                ),
+                migrations.AddField(
+                    model_name='usableingredient',
+                    name='ingredient',
+                    field=models.ForeignKey(
+                        db_constraint=False, db_index=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='usages', to='api.ingredient'
+                    ),
+                ),
+            ],
+        ),
+        AlterFieldOnline(
+            model_name='usableingredient',
+            name='ingredient',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='usages', to='api.ingredient'
+            ),
+        ),
+    ]
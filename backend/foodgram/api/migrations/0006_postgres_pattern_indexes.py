@@ -0,0 +1,40 @@
+from django.db import migrations
+
+FORWARD = [
+    'DROP INDEX CONCURRENTLY IF EXISTS ingredient_upper_name_idx',
+    'CREATE INDEX CONCURRENTLY ingredient_upper_name_idx '
+    'ON api_ingredient (UPPER(name) text_pattern_ops)',
+]
+BACKWARD = [
+    'DROP INDEX CONCURRENTLY IF EXISTS ingredient_upper_name_idx',
+    'CREATE INDEX CONCURRENTLY ingredient_upper_name_idx '
+    'ON api_ingredient (UPPER(name))',
+]
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+    """Lets PostgreSQL use the name index for LIKE 'prefix%' lookups.
+
+    Under a non-C collation a plain btree index cannot serve istartswith,
+    text_pattern_ops can. Other databases keep the portable index.
+    """
+    atomic = False
+
+    dependencies = [
+        ('api', '0005_usableingredient_ingredient_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(FORWARD), run_on_postgresql(BACKWARD)
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Folds catalog entries with the same name and unit into the oldest one.
+
+    Recipes that used several of the copies keep a single row with the
+    amounts added up.
+    """
+    Ingredient = apps.get_model('api', 'Ingredient')
+    UsableIngredient = apps.get_model('api', 'UsableIngredient')
+    db = schema_editor.connection.alias
+    duplicates = (
+        Ingredient.objects.using(db)
+        .values('name', 'measurement_unit')
+        .annotate(rows=Count('id'), keep_id=Min('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates.iterator():
+        keep_id = duplicate['keep_id']
+        with transaction.atomic(using=db):
+            copies = list(
+                Ingredient.objects.using(db).filter(
+                    name=duplicate['name'],
+                    measurement_unit=duplicate['measurement_unit'],
+                ).exclude(id=keep_id).values_list('id', flat=True)
+            )
+            usages = UsableIngredient.objects.using(db).filter(
+                ingredient_id__in=copies).order_by('id')
+            for usage in usages:
+                kept = UsableIngredient.objects.using(db).filter(
+                    recipe_id=usage.recipe_id, ingredient_id=keep_id
+                ).first()
+                if kept is None:
+                    usage.ingredient_id = keep_id
+                    usage.save(update_fields=['ingredient'])
+                else:
+                    kept.amount += usage.amount
+                    kept.save(update_fields=['amount'])
+                    usage.delete()
+            Ingredient.objects.using(db).filter(id__in=copies).delete()
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.1 on 2026-10-18 19:02
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+# api.search.search_document as of this migration, frozen in SQL. Later
+# changes to the document refill the vectors in their own migration.
+FILL_VECTORS = '''
+UPDATE api_recipe r SET search_vector =
+    setweight(to_tsvector('russian', coalesce(r.name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM api_usableingredient u
+        JOIN api_ingredient i ON i.id = u.ingredient_id
+        WHERE u.recipe_id = r.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(r.text, '')), 'C')
+WHERE r.id > %s AND r.id <= %s
+'''
+
+
+def fill_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT coalesce(max(id), 0) FROM api_recipe')
+        last_id = cursor.fetchone()[0]
+        for start in range(0, last_id, BATCH_SIZE):
+            cursor.execute(FILL_VECTORS, [start, start + BATCH_SIZE])
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS recipe_search_vector_idx '
+        'ON api_recipe USING gin (search_vector)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+    """Adds the full-text search column of recipes.
+
+    On PostgreSQL the column is filled in batches and indexed with GIN
+    without locking the table. Other databases search with LIKE instead.
+    """
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
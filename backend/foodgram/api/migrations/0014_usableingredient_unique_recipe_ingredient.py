@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+from foodgram.migration_operations import AddUniqueConstraintOnline
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_recipe_search_vector'),
+    ]
+
+    operations = [
+        AddUniqueConstraintOnline(
+            model_name='usableingredient',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'
+            ),
+        ),
+    ]
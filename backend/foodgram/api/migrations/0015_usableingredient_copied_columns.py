@@ -0,0 +1,56 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def restore_copied_columns(apps, schema_editor):
+    Ingredient = apps.get_model('api', 'Ingredient')
+    UsableIngredient = apps.get_model('api', 'UsableIngredient')
+    catalog = Ingredient.objects.filter(id=OuterRef('ingredient_id'))
+    UsableIngredient.objects.using(schema_editor.connection.alias).filter(
+        name__isnull=True
+    ).update(
+        name=Subquery(catalog.values('name')[:1]),
+        measurement_unit=Subquery(catalog.values('measurement_unit')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    """Stops using the name and unit copied into UsableIngredient.
+
+    The columns only become nullable here, so code still writing them
+    keeps working while a release rolls out. They leave the state now and
+    are dropped from the database in a later release, once no running
+    code reads them.
+    """
+
+    dependencies = [
+        ('api', '0014_usableingredient_unique_recipe_ingredient'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usableingredient',
+            name='measurement_unit',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='usableingredient',
+            name='name',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_copied_columns
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='usableingredient',
+                    name='measurement_unit',
+                ),
+                migrations.RemoveField(
+                    model_name='usableingredient',
+                    name='name',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+from foodgram.migration_operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0015_usableingredient_copied_columns'),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='recipe',
+            index=models.Index(
+                condition=models.Q(feed_pull=True),
+                fields=['author', '-id'], name='recipe_feed_pull_idx'
+            ),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Q, Value, Window
+from django.db.models.functions import RowNumber, Upper
+from django.utils import timezone
 from users.models import User
 
 
@@ -8,6 +12,14 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(Upper('name'), name='ingredient_upper_name_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'], name='unique_ingredient'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -16,36 +28,136 @@ class Ingredient(models.Model):
 class Tag(models.Model):
     name = models.TextField()
     collor = models.TextField()
-    slug = models.SlugField()
+    slug = models.SlugField(unique=True)
 
     def __str__(self) -> str:
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Recipe.favorite.through.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )),
+            is_in_shopping_cart=Exists(
+                Recipe.shopping_cart.through.objects.filter(
+                    recipe=OuterRef('pk'), user=user
+                )
+            ),
+            author_is_subscribed=Exists(
+                User.subscribers.through.objects.filter(
+                    from_user=OuterRef('author'), to_user=user
+                )
+            ),
+        )
+
+    def adjust_counter(self, field, delta):
+        """Atomically add ``delta`` to a counter column of every recipe."""
+        return self.update(**{
+            field: F(field) + delta, 'updated_at': timezone.now()
+        })
+
+    def latest_by_author(self, author_ids, limit=None):
+        queryset = self.filter(author_id__in=author_ids).only(
+            'id', 'author_id', 'name', 'image', 'image_thumbnail',
+            'cooking_time'
+        )
+        if limit is None:
+            return list(queryset.order_by('-id'))
+        ranked = queryset.annotate(recipe_rank=Window(
+            RowNumber(), partition_by=F('author_id'), order_by=F('id').desc()
+        )).order_by()
+        sql, params = ranked.query.sql_with_params()
+        return list(self.model.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s '
+            'ORDER BY id DESC', (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes'
     )
     name = models.TextField()
     image = models.ImageField(upload_to='recipes/images/')
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails/', blank=True
+    )
+    image_webp = models.ImageField(upload_to='recipes/images/', blank=True)
     text = models.TextField()
     tags = models.ManyToManyField(Tag)
     cooking_time = models.IntegerField()
     favorite = models.ManyToManyField(User, related_name='favorites')
     shopping_cart = models.ManyToManyField(User, related_name='shopping_cart')
+    updated_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0)
+    in_carts_count = models.PositiveIntegerField(default=0)
+    # Set when the author had too many followers to fan the recipe out;
+    # feeds then pull it from the recipe table instead.
+    feed_pull = models.BooleanField(default=False)
+    # Maintained by api.search on PostgreSQL only, where a GIN index
+    # created by migration 0013 serves it; NULL on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_id_idx'),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=['author', '-id'], condition=Q(feed_pull=True),
+                name='recipe_feed_pull_idx'
+            ),
+        ]
     
     def __str__(self) -> str:
         return f'{self.name} {self.id}'
 
 
 class UsableIngredient(models.Model):
-    ingredient_id = models.IntegerField()
-    name = models.TextField()
-    measurement_unit = models.TextField()
+    ingredient = models.ForeignKey(
+        Ingredient, related_name='usages', on_delete=models.PROTECT
+    )
     amount = models.FloatField()
     recipe = models.ForeignKey(
         Recipe, related_name='ingredients', on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """A recipe delivered to the feed of one follower of its author."""
+    user = models.ForeignKey(
+        User, related_name='feed_entries', on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe, related_name='feed_entries', on_delete=models.CASCADE
+    )
+
+    class Meta:
+        # Also the index feed pages are read from, newest recipe first.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            ),
+        ]
@@ -0,0 +1,20 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FirstRendererFallback(DefaultContentNegotiation):
+    """Answers with the first fitting renderer when ``Accept`` matches none.
+
+    Browsers and HTTP clients send ``application/json`` or ``*/*`` by
+    default; an unknown ``?format=`` is still a 404.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format = format_suffix or request.query_params.get(
+                self.settings.URL_FORMAT_OVERRIDE)
+            if format:
+                renderers = self.filter_renderers(renderers, format)
+            return renderers[0], renderers[0].media_type
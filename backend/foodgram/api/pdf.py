@@ -0,0 +1,119 @@
+"""Minimal streaming PDF writer for plain text documents.
+
+Pages are emitted as soon as they are filled, so only the current page and
+the object offsets are kept in memory. Text is encoded as cp1251 and mapped
+to the standard Cyrillic glyph names, so no font files are required.
+"""
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 14
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+FIRST_PAGE_ID = 4
+
+UPPERCASE = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+LOWERCASE = UPPERCASE.lower()
+
+
+def _cyrillic_differences():
+    glyphs = []
+    for letters, first_glyph in ((UPPERCASE, 10017), (LOWERCASE, 10065)):
+        for index, letter in enumerate(letters):
+            code = letter.encode('cp1251')[0]
+            glyphs.append(f'{code} /afii{first_glyph + index}')
+    return ' '.join(glyphs)
+
+
+def _escape(line):
+    line = line.encode('cp1251', errors='replace')
+    return (
+        line.replace(b'\\', b'\\\\')
+        .replace(b'(', b'\\(')
+        .replace(b')', b'\\)')
+    )
+
+
+def _page_content(lines):
+    content = [
+        f'BT /F1 {FONT_SIZE} Tf {LEADING} TL '
+        f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode()
+    ]
+    for line in lines:
+        content.append(b'(' + _escape(line) + b') Tj T*')
+    content.append(b'ET')
+    return b'\n'.join(content)
+
+
+def _pages(lines):
+    page = []
+    empty = True
+    for line in lines:
+        page.append(line.rstrip('\n'))
+        if len(page) == LINES_PER_PAGE:
+            yield page
+            page = []
+            empty = False
+    if page or empty:
+        yield page
+
+
+def render_pdf(lines, base_font='Helvetica'):
+    offsets = {}
+    position = 0
+
+    def write_object(object_id, body):
+        nonlocal position
+        offsets[object_id] = position
+        chunk = f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+    yield write_object(
+        CATALOG_ID, f'<< /Type /Catalog /Pages {PAGES_ID} 0 R >>'.encode()
+    )
+    yield write_object(FONT_ID, (
+        f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} '
+        f'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        f'/Differences [{_cyrillic_differences()}] >> >>'
+    ).encode())
+
+    page_ids = []
+    object_id = FIRST_PAGE_ID
+    for page in _pages(lines):
+        content = _page_content(page)
+        yield write_object(
+            object_id,
+            f'<< /Length {len(content)} >>\nstream\n'.encode()
+            + content + b'\nendstream'
+        )
+        yield write_object(object_id + 1, (
+            f'<< /Type /Page /Parent {PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {FONT_ID} 0 R >> >> '
+            f'/Contents {object_id} 0 R >>'
+        ).encode())
+        page_ids.append(object_id + 1)
+        object_id += 2
+
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    yield write_object(PAGES_ID, (
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'
+    ).encode())
+
+    xref = [f'xref\n0 {object_id}\n', '0000000000 65535 f \n']
+    for index in range(1, object_id):
+        xref.append(f'{offsets[index]:010d} 00000 n \n')
+    yield ''.join(xref).encode()
+    yield (
+        f'trailer\n<< /Size {object_id} /Root {CATALOG_ID} 0 R >>\n'
+        f'startxref\n{position}\n%%EOF\n'
+    ).encode()
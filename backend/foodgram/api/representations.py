@@ -0,0 +1,76 @@
+"""Read-only recipe representations built from ``.values()`` rows.
+
+``load_recipes`` returns what ``RecipeSerializer`` returns for an anonymous
+user, field for field, with the same three queries and without building
+serializer fields for every nested object.
+"""
+from collections import defaultdict
+
+from users.serializer import USER_READ_FIELDS
+from .models import Recipe, UsableIngredient
+
+RECIPE_COLUMNS = (
+    'id', 'name', 'image', 'image_thumbnail', 'image_webp', 'text',
+    'cooking_time', 'favorites_count', 'in_carts_count'
+)
+AUTHOR_FIELDS = tuple(
+    field for field in USER_READ_FIELDS if field != 'is_subscribed')
+AUTHOR_COLUMNS = tuple(f'author__{field}' for field in AUTHOR_FIELDS)
+
+
+def load_recipes(ids, build_url):
+    """Representations of the recipes with ``ids``, keyed by id.
+
+    ``build_url`` turns a media path into the URL served to clients,
+    usually ``request.build_absolute_uri``.
+    """
+    storage = Recipe._meta.get_field('image').storage
+
+    def image_url(name):
+        return build_url(storage.url(name)) if name else None
+
+    tags = defaultdict(list)
+    for recipe_id, *tag in Recipe.tags.through.objects.filter(
+        recipe_id__in=ids
+    ).order_by('tag_id').values_list(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__collor', 'tag__slug'
+    ):
+        tags[recipe_id].append(
+            dict(zip(('id', 'name', 'collor', 'slug'), tag)))
+    ingredients = defaultdict(list)
+    for recipe_id, *ingredient in UsableIngredient.objects.filter(
+        recipe_id__in=ids
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[recipe_id].append(dict(zip(
+            ('id', 'name', 'measurement_unit', 'amount'), ingredient)))
+
+    recipes = {}
+    for row in Recipe.objects.filter(id__in=ids).order_by().values(
+        *RECIPE_COLUMNS, *AUTHOR_COLUMNS
+    ):
+        author = {
+            field: row[column]
+            for field, column in zip(AUTHOR_FIELDS, AUTHOR_COLUMNS)
+        }
+        author['is_subscribed'] = False
+        recipes[row['id']] = {
+            'id': row['id'],
+            'author': author,
+            'name': row['name'],
+            'image': image_url(row['image']),
+            'image_thumbnail': image_url(
+                row['image_thumbnail'] or row['image']),
+            'image_webp': image_url(row['image_webp'] or row['image']),
+            'text': row['text'],
+            'ingredients': ingredients[row['id']],
+            'tags': tags[row['id']],
+            'cooking_time': row['cooking_time'],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'favorites_count': row['favorites_count'],
+            'in_carts_count': row['in_carts_count'],
+        }
+    return recipes
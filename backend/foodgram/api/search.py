@@ -0,0 +1,126 @@
+"""Full-text search over recipe names, descriptions and ingredient names.
+
+On PostgreSQL every recipe keeps a weighted ``tsvector`` in
+``Recipe.search_vector``, refreshed when a change commits and matched
+through a GIN index. Other databases fall back to substring matches of
+casefolded text; SQLite gets a Unicode ``casefold`` function for that,
+because its own ``LIKE`` and ``lower()`` only fold ASCII.
+"""
+import threading
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import (
+    Case, Exists, F, FloatField, Func, OuterRef, Q, Subquery, TextField,
+    Value, When
+)
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Ingredient, Recipe, UsableIngredient
+
+CONFIG = 'russian'
+
+pending = threading.local()
+
+
+class Casefold(Func):
+    function = 'LOWER'
+    output_field = TextField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='CASEFOLD', **extra_context)
+
+
+@receiver(connection_created)
+def register_casefold(connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'CASEFOLD', 1, lambda value: value and value.casefold(),
+            deterministic=True
+        )
+
+
+def search_document():
+    """Name first, then ingredient names, then the description."""
+    ingredient_names = Subquery(
+        UsableIngredient.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names'),
+        output_field=TextField()
+    )
+    return (
+        SearchVector('name', weight='A', config=CONFIG) +
+        SearchVector(ingredient_names, weight='B', config=CONFIG) +
+        SearchVector('text', weight='C', config=CONFIG)
+    )
+
+
+def search_recipes(queryset, text):
+    """Filter ``queryset`` by ``text`` and annotate ``search_rank``."""
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(text, config=CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query))
+    text = text.casefold()
+    in_name = Q(search_name__contains=text)
+    return queryset.alias(
+        search_name=Casefold('name'), search_text=Casefold('text')
+    ).filter(
+        in_name | Q(search_text__contains=text) | Exists(
+            UsableIngredient.objects.alias(
+                search_name=Casefold('ingredient__name')
+            ).filter(recipe=OuterRef('pk'), search_name__contains=text)
+        )
+    ).annotate(search_rank=Case(
+        When(in_name, then=Value(1.0)), default=Value(0.0),
+        output_field=FloatField()
+    ))
+
+
+def refresh_search_vectors(ids):
+    """Recompute the vectors of recipes once the transaction commits.
+
+    Ids collected during one transaction are updated with one query.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    if not hasattr(pending, 'ids'):
+        pending.ids = set()
+    pending.ids.update(ids)
+    transaction.on_commit(flush_search_vectors)
+
+
+def flush_search_vectors():
+    ids, pending.ids = pending.ids, set()
+    if ids:
+        Recipe.objects.filter(id__in=ids).update(
+            search_vector=search_document())
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        refresh_search_vectors([instance.id])
+
+
+@receiver(post_save, sender=UsableIngredient)
+@receiver(post_delete, sender=UsableIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    refresh_search_vectors([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(instance, created, **kwargs):
+    if created or connection.vendor != 'postgresql':
+        return
+    transaction.on_commit(lambda: Recipe.objects.filter(Exists(
+        UsableIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient=instance)
+    )).update(search_vector=search_document()))
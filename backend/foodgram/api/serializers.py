@@ -1,7 +1,12 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from .models import Ingredient, Tag, Recipe, UsableIngredient
 from users.serializer import UserSerializer
-from drf_base64.fields import Base64ImageField
+from .feed import fan_out_recipe
+from .fields import ImageVariantField, RecipeImageField
+from .images import generate_image_variants
+from .tasks import submit_on_commit
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,6 +26,9 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class UsableIngredientSeializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit')
 
     class Meta:
         model = UsableIngredient
@@ -35,92 +43,163 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         'recipe_is_in_shopping_cart'
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
+    image_thumbnail = ImageVariantField()
+    image_webp = ImageVariantField()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text',
+            'id', 'author', 'name', 'image', 'image_thumbnail', 'image_webp',
+            'text',
             'ingredients', 'tags', 'cooking_time', 'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart', 'favorites_count', 'in_carts_count'
         )
+        read_only_fields = ('favorites_count', 'in_carts_count')
     
     def validate(self, attrs):
-        for i in self.initial_data.get('ingredients'):
-            if (
-                type(i) != dict or 'id' not in i or 'amount' not in i or
-                not Ingredient.objects.filter(id=i.get('id')).exists()
-            ):
-                raise serializers.ValidationError('Ingredients invalid')
-        for i in self.initial_data.get('tags'):
-            if not Tag.objects.filter(id=i).exists():
-                raise serializers.ValidationError('Tag invalid')
+        ingredients = self.initial_data.get('ingredients')
+        if ingredients is not None or not self.partial:
+            attrs['ingredients'] = self.validate_ingredient_amounts(
+                ingredients)
+        tags = self.initial_data.get('tags')
+        if tags is not None or not self.partial:
+            attrs['tags'] = self.validate_tag_ids(tags)
         return attrs
-    
+
+    def validate_ingredient_amounts(self, ingredients):
+        if not isinstance(ingredients, list):
+            raise serializers.ValidationError('Ingredients invalid')
+        amounts = {}
+        for i in ingredients:
+            try:
+                amounts[int(i['id'])] = float(i['amount'])
+            except (TypeError, KeyError, ValueError):
+                raise serializers.ValidationError('Ingredients invalid')
+        catalog = Ingredient.objects.in_bulk(list(amounts))
+        if len(catalog) != len(amounts) or len(amounts) != len(ingredients):
+            raise serializers.ValidationError('Ingredients invalid')
+        return [(catalog[id], amount) for id, amount in amounts.items()]
+
+    def validate_tag_ids(self, tags):
+        if not isinstance(tags, list):
+            raise serializers.ValidationError('Tag invalid')
+        try:
+            ids = {int(i) for i in tags}
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('Tag invalid')
+        catalog = Tag.objects.in_bulk(list(ids))
+        if len(catalog) != len(ids):
+            raise serializers.ValidationError('Tag invalid')
+        return list(catalog.values())
+
     def create(self, validated_data):
         user = self.context.get("request").user
-        ingredients = []
-        if 'ingredients' in self.initial_data:
-            ingredients = self.initial_data.pop('ingredients')
-        tags = []
-        if 'tags' in self.initial_data:
-            tags = self.initial_data.pop('tags')
-
-        recipe = Recipe.objects.create(**validated_data, author=user)
-
-        for tag in tags:
-            recipe.tags.add(tag)
-        for ingredient in ingredients:
-            amount = ingredient.get('amount')
-            ingredient = IngredientSerializer(
-                Ingredient.objects.get(id=ingredient.get('id'))
-            )
-            data = ingredient.data
-            UsableIngredient.objects.create(
-                ingredient_id=data.pop('id'), **data, amount=amount,
-                recipe=recipe
-            )
+        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags')
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data, author=user)
+            recipe.tags.set(tags)
+            UsableIngredient.objects.bulk_create([
+                UsableIngredient(
+                    ingredient=ingredient, amount=amount, recipe=recipe
+                ) for ingredient, amount in ingredients
+            ])
+            submit_on_commit(generate_image_variants, recipe.id)
+            submit_on_commit(fan_out_recipe, recipe.id)
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients = []
-        if 'ingredients' in self.initial_data:
-            instance.ingredients.all().delete()
-            ingredients = self.initial_data.pop('ingredients')
-        tags = []
-        if 'tags' in self.initial_data:
-            instance.tags.clear()
-            tags = self.initial_data.pop('tags')
-
-        for tag in tags:
-            instance.tags.add(tag)
-        for ingredient in ingredients:
-            amount = ingredient.get('amount')
-            ingredient = IngredientSerializer(
-                Ingredient.objects.get(id=ingredient.get('id'))
-            )
-            data = ingredient.data
-            UsableIngredient.objects.create(
-                ingredient_id=data.pop('id'), **data, amount=amount,
-                recipe=instance
-            )
-
-        return super().update(instance, validated_data)
-    
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            if tags is not None:
+                instance.tags.set(tags)
+            if ingredients is not None:
+                self.update_ingredients(instance, ingredients)
+            if 'image' in validated_data:
+                validated_data['image_thumbnail'] = ''
+                validated_data['image_webp'] = ''
+                submit_on_commit(generate_image_variants, instance.id)
+            return super().update(instance, validated_data)
+
+    def update_ingredients(self, instance, ingredients):
+        existing = {
+            row.ingredient_id: row
+            for row in UsableIngredient.objects.filter(recipe=instance)
+        }
+        changed = []
+        created = []
+        for ingredient, amount in ingredients:
+            row = existing.pop(ingredient.id, None)
+            if row is None:
+                created.append(UsableIngredient(
+                    ingredient=ingredient, amount=amount, recipe=instance
+                ))
+            elif row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if existing:
+            UsableIngredient.objects.filter(
+                id__in=[row.id for row in existing.values()]
+            ).delete()
+        UsableIngredient.objects.bulk_update(changed, ['amount'])
+        UsableIngredient.objects.bulk_create(created)
+
+    def to_representation(self, instance):
+        if 'ingredients' not in getattr(
+            instance, '_prefetched_objects_cache', {}
+        ):
+            prefetch_related_objects([instance], Prefetch(
+                'ingredients',
+                UsableIngredient.objects.select_related('ingredient')
+            ))
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def is_favorite(self, instance):
+        if hasattr(instance, 'is_favorited'):
+            return instance.is_favorited
+        user = self.context.get('request').user
         return (
-            self.context.get('request').user in
-            instance.favorite.all()
+            user.is_authenticated and
+            instance.favorite.filter(id=user.id).exists()
         )
     
     def recipe_is_in_shopping_cart(self, instance):
+        if hasattr(instance, 'is_in_shopping_cart'):
+            return instance.is_in_shopping_cart
+        user = self.context.get('request').user
         return (
-            self.context.get('request').user in
-            instance.shopping_cart.all()
+            user.is_authenticated and
+            instance.shopping_cart.filter(id=user.id).exists()
         )
 
 
 class RecipeDeserializer(serializers.ModelSerializer):
+    image_thumbnail = ImageVariantField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
+
+
+class SubscriptionSerializer(UserSerializer):
+    recipes = RecipeDeserializer(
+        source='latest_recipes', many=True, read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
+
+    @staticmethod
+    def attach_recipes(authors, recipes_limit=None):
+        recipes = {author.id: [] for author in authors}
+        for recipe in Recipe.objects.latest_by_author(
+            list(recipes), recipes_limit
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        return authors
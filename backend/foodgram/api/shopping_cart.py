@@ -0,0 +1,113 @@
+import csv
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.http import StreamingHttpResponse
+
+from foodgram.streaming import AsyncStreamingHttpResponse
+from .models import UsableIngredient
+from .pdf import render_pdf
+
+GROUPINGS = {
+    'recipe': ('recipe_id', 'recipe__name'),
+    'user': ('recipe__shopping_cart', 'recipe__shopping_cart__username'),
+}
+CHUNK_SIZE = 2000
+
+
+def get_shopping_cart_ingredients(users, group_by=None):
+    queryset = UsableIngredient.objects.filter(recipe__shopping_cart__in=users)
+    fields = ['ingredient_id', 'ingredient_name', 'measurement_unit']
+    ordering = ['ingredient_name', 'measurement_unit', 'ingredient_id']
+    if group_by is not None:
+        key, title = GROUPINGS[group_by]
+        queryset = queryset.annotate(group=F(title))
+        fields = ['group', key, *fields]
+        ordering = ['group', key, *ordering]
+    return (
+        queryset
+        .annotate(
+            ingredient_name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        )
+        .values(*fields)
+        .annotate(amount=Sum('amount'))
+        .order_by(*ordering)
+    )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def _format_line(ingredient):
+    return (
+        f"{ingredient['ingredient_name']} "
+        f"({ingredient['measurement_unit']}) - {ingredient['amount']}\n"
+    )
+
+
+def shopping_cart_lines(ingredients):
+    group = None
+    for ingredient in ingredients:
+        if 'group' in ingredient and ingredient['group'] != group:
+            group = ingredient['group']
+            yield f'\n{group}:\n'
+        yield _format_line(ingredient)
+
+
+def shopping_cart_csv(ingredients, grouped=False):
+    writer = csv.writer(Echo())
+    header = ['name', 'measurement_unit', 'amount']
+    if grouped:
+        header.insert(0, 'group')
+    yield writer.writerow(header)
+    for ingredient in ingredients:
+        row = [
+            ingredient['ingredient_name'], ingredient['measurement_unit'],
+            ingredient['amount']
+        ]
+        if grouped:
+            row.insert(0, ingredient['group'])
+        yield writer.writerow(row)
+
+
+def shopping_cart_pdf(ingredients, grouped=False):
+    return render_pdf(shopping_cart_lines(ingredients))
+
+
+def shopping_cart_txt(ingredients, grouped=False):
+    return shopping_cart_lines(ingredients)
+
+
+EXPORTS = {
+    'txt': ('text/plain; charset=utf-8', shopping_cart_txt),
+    'csv': ('text/csv; charset=utf-8', shopping_cart_csv),
+    'pdf': ('application/pdf', shopping_cart_pdf),
+}
+
+
+def shopping_cart_response(ingredients, export_format='txt', grouped=False,
+                           filename='shopping_cart'):
+    content_type, render = EXPORTS[export_format]
+    # Django 4.1 iterates streaming responses inside the event loop under
+    # ASGI, where the database cannot be queried.
+    response_class = (
+        AsyncStreamingHttpResponse if settings.SERVER_MODE == 'asgi'
+        else StreamingHttpResponse
+    )
+    response = response_class(
+        render(ingredients, grouped=grouped), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename={filename}.{export_format}'
+    )
+    return response
+
+
+def export_shopping_cart(users, export_format='txt', group_by=None,
+                         filename='shopping_cart'):
+    ingredients = get_shopping_cart_ingredients(
+        users, group_by).iterator(chunk_size=CHUNK_SIZE)
+    return shopping_cart_response(
+        ingredients, export_format, group_by is not None, filename)
@@ -0,0 +1,42 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='foodgram-worker'
+        )
+    return _executor
+
+
+def run_task(task, *args):
+    close_old_connections()
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Background task %s failed', task.__name__)
+    finally:
+        close_old_connections()
+
+
+def submit_on_commit(task, *args):
+    """Runs task(*args) in a background thread once the transaction commits.
+
+    With BACKGROUND_TASKS_ASYNC disabled the task runs inline, which keeps
+    management commands and tests deterministic.
+    """
+    if not settings.BACKGROUND_TASKS_ASYNC:
+        transaction.on_commit(lambda: task(*args))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_task, task, *args)
+    )
@@ -1,3 +1,819 @@
-from django.test import TestCase
+from base64 import b64encode
+from io import BytesIO, StringIO
+from tempfile import mkdtemp
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, resolve
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from users.models import User
+from .benchmarks import (
+    check_budget, load_budgets, prepare, run_scenario, scenarios, seed
+)
+from .models import FeedEntry, Ingredient, Recipe, Tag, UsableIngredient
+from .renderers import FastJSONRenderer
+from .representations import load_recipes
+from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+
+IMAGE = (
+    'data:image/gif;base64,R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAA'
+    'ICRAEAOw=='
+)
+
+
+@override_settings(MEDIA_ROOT=mkdtemp())
+class RecipeWriteTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'ingredient {i}', measurement_unit='г')
+            for i in range(40)
+        ])
+        cls.tags = Tag.objects.bulk_create([
+            Tag(name=f'tag {i}', collor='#E26C2D', slug=f'tag-{i}')
+            for i in range(10)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def payload(self, ingredients, tags, **kwargs):
+        return {
+            'name': 'recipe', 'text': 'text', 'cooking_time': 10,
+            'image': IMAGE,
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+            'tags': [tag.id for tag in tags],
+            **kwargs
+        }
+
+    def create(self, ingredients_count, tags_count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/recipes/', self.payload(
+                [(i, 10) for i in self.ingredients[:ingredients_count]],
+                self.tags[:tags_count]
+            ), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json(), len(queries)
+
+    def update(self, recipe_id, ingredients, tags_count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{recipe_id}/',
+                self.payload(ingredients, self.tags[:tags_count]),
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), len(queries)
+
+    def test_create_query_count_does_not_grow_with_ingredients(self):
+        small, small_queries = self.create(1, 1)
+        large, large_queries = self.create(30, 5)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(len(large['ingredients']), 30)
+        self.assertEqual(len(large['tags']), 5)
+
+    def test_update_query_count_does_not_grow_with_ingredients(self):
+        small, _ = self.create(2, 1)
+        large, _ = self.create(30, 1)
+        _, small_queries = self.update(small['id'], [
+            (self.ingredients[0], 20), (self.ingredients[35], 5)
+        ], 2)
+        _, large_queries = self.update(large['id'], [
+            (ingredient, 20) for ingredient in self.ingredients[10:40]
+        ], 5)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_update_keeps_unchanged_rows(self):
+        recipe, _ = self.create(3, 1)
+        kept = UsableIngredient.objects.get(
+            recipe_id=recipe['id'], ingredient_id=self.ingredients[0].id)
+        data, _ = self.update(recipe['id'], [
+            (self.ingredients[0], 10), (self.ingredients[1], 50),
+            (self.ingredients[5], 1)
+        ], 1)
+        self.assertTrue(UsableIngredient.objects.filter(id=kept.id).exists())
+        self.assertEqual(
+            {(i['id'], i['amount']) for i in data['ingredients']},
+            {
+                (self.ingredients[0].id, 10), (self.ingredients[1].id, 50),
+                (self.ingredients[5].id, 1)
+            }
+        )
+
+    def test_invalid_ingredient_creates_nothing(self):
+        payload = self.payload(
+            [(self.ingredients[0], 10)], self.tags[:1])
+        payload['ingredients'].append({'id': 0, 'amount': 1})
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_duplicate_ingredients_are_rejected(self):
+        response = self.client.post('/api/recipes/', self.payload(
+            [(self.ingredients[0], 10), (self.ingredients[0], 5)],
+            self.tags[:1]
+        ), format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(INGREDIENT_SEARCH_LIMIT=3)
+class IngredientSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Соль {i}', measurement_unit='г')
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        return self.client.get('/api/ingredients/', {'name': 'соль', **params})
+
+    def test_limit_is_capped(self):
+        for max_size in (100, 1):
+            with self.subTest(max_size), override_settings(
+                INGREDIENT_INDEX_MAX_SIZE=max_size
+            ):
+                self.assertEqual(len(self.search().json()), 3)
+                self.assertEqual(len(self.search(limit=2).json()), 2)
+                self.assertEqual(len(self.search(limit=100).json()), 3)
+
+    def test_invalid_limit_is_rejected(self):
+        for max_size in (100, 1):
+            for limit in ('0', '-1', 'many'):
+                with self.subTest((max_size, limit)), override_settings(
+                    INGREDIENT_INDEX_MAX_SIZE=max_size
+                ):
+                    self.assertEqual(
+                        self.search(limit=limit).status_code, 400)
+
+    def test_new_ingredient_is_found_after_commit(self):
+        self.assertEqual(len(self.search(name='перец').json()), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Перец', measurement_unit='г')
+        self.assertEqual(len(self.search(name='перец').json()), 1)
+
+
+class CursorPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        for i in range(5):
+            cls.create_recipe(f'recipe {i}')
+
+    @classmethod
+    def create_recipe(cls, name):
+        return Recipe.objects.create(
+            author=cls.author, name=name, text='text', cooking_time=10,
+            image='recipes/images/bench.gif'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url='/api/recipes/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertNotIn('count', data)
+        return [recipe['id'] for recipe in data['results']], data
+
+    def test_links_are_stable(self):
+        first, data = self.get(cursor='', limit=2)
+        second, data = self.get(data['next'])
+        self.assertEqual(self.get(data['previous'])[0], first)
+        third = self.get(data['next'])[0]
+        self.assertEqual(self.get(data['next'])[0], third)
+        self.assertTrue(set(first).isdisjoint(second))
+
+    def test_inserts_cause_no_duplicates_or_gaps(self):
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True))
+        seen, data = self.get(cursor='', limit=2)
+        while data['next']:
+            self.create_recipe('inserted')
+            ids, data = self.get(data['next'])
+            seen += ids
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('not base64!', 'cD1hYmM='):
+            with self.subTest(cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class RecipeSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        peas = Ingredient.objects.create(name='Горох', measurement_unit='г')
+        for name, ingredient in (('Суп', peas), ('Борщ', None)):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Вкусно', cooking_time=10,
+                image='recipes/images/bench.gif'
+            )
+            if ingredient is not None:
+                UsableIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, text):
+        response = self.client.get('/api/recipes/', {'search': text})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_search_ignores_case_beyond_ascii(self):
+        self.assertEqual(self.search('суп'), ['Суп'])
+        self.assertEqual(self.search('ГОРОХ'), ['Суп'])
+        self.assertEqual(sorted(self.search('вкусно')), ['Борщ', 'Суп'])
+
+
+@override_settings(MEDIA_ROOT=mkdtemp(), BACKGROUND_TASKS_ASYNC=False)
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        cls.ingredient = Ingredient.objects.create(
+            name='Горох', measurement_unit='г')
+        cls.tag = Tag.objects.create(
+            name='Обед', collor='#E26C2D', slug='lunch')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Вкусно', cooking_time=10,
+            image='recipes/images/bench.gif'
+        )
+        cls.recipe.tags.add(cls.tag)
+        UsableIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.urls = ('/api/recipes/', f'/api/recipes/{self.recipe.id}/')
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response['ETag']
+
+    def etags(self):
+        return [self.etag(url) for url in self.urls]
+
+    def test_matching_etag_is_not_modified(self):
+        for url in self.urls:
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=self.etag(url))
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_etag_changes_after_edit(self):
+        before = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/', {
+                    'name': 'Суп гороховый', 'text': 'Вкусно',
+                    'cooking_time': 10, 'image': IMAGE,
+                    'tags': [self.tag.id],
+                    'ingredients': [{'id': self.ingredient.id, 'amount': 2}]
+                }, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        after = self.etags()
+        for url, old, new in zip(self.urls, before, after):
+            self.assertNotEqual(old, new, url)
+
+    def test_etag_changes_after_favorite_toggle(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        for method, status in (('post', 201), ('delete', 204)):
+            before = self.etags()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(url)
+            self.assertEqual(response.status_code, status, response.content)
+            after = self.etags()
+            for url_, old, new in zip(self.urls, before, after):
+                self.assertNotEqual(old, new, (method, url_))
+
+    def test_popularity_order_is_revalidated_after_favorite(self):
+        other = Recipe.objects.create(
+            author=self.user, name='Борщ', text='Вкусно', cooking_time=10,
+            image='recipes/images/bench.gif'
+        )
+        url = '/api/recipes/?ordering=-popularity'
+        self.client.force_authenticate(None)
+        response = self.client.get(url)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [other.id, self.recipe.id]
+        )
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.client.force_authenticate(None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.recipe.id, other.id]
+        )
+
+
+def image_data(size, format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format)
+    return (
+        f'data:image/{format.lower()};base64,'
+        f'{b64encode(buffer.getvalue()).decode()}'
+    )
+
+
+@override_settings(MEDIA_ROOT=mkdtemp(), BACKGROUND_TASKS_ASYNC=False)
+class ImageVariantTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        cls.tag = Tag.objects.create(
+            name='Обед', collor='#E26C2D', slug='lunch')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def create(self, image):
+        return self.client.post('/api/recipes/', {
+            'name': 'recipe', 'text': 'text', 'cooking_time': 10,
+            'image': image, 'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 1}]
+        }, format='json')
+
+    def detail(self, recipe_id):
+        return self.client.get(f'/api/recipes/{recipe_id}/').json()
+
+    def assert_variants(self, recipe_id):
+        recipe = Recipe.objects.get(id=recipe_id)
+        for field, size in (
+            (recipe.image_webp, (600, 300)),
+            (recipe.image_thumbnail, (480, 240))
+        ):
+            with field.open('rb') as file, Image.open(file) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', size))
+        data = self.detail(recipe_id)
+        self.assertEqual(
+            data['image_webp'], f'http://testserver{recipe.image_webp.url}')
+        self.assertEqual(
+            data['image_thumbnail'],
+            f'http://testserver{recipe.image_thumbnail.url}'
+        )
+
+    def test_variants_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.create(image_data((600, 300)))
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe_id = response.json()['id']
+        # Until the variants exist the original image is served.
+        data = self.detail(recipe_id)
+        self.assertTrue(data['image'].endswith('.png'))
+        self.assertEqual(data['image_thumbnail'], data['image'])
+        self.assertEqual(data['image_webp'], data['image'])
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assert_variants(recipe_id)
+
+    def test_command_generates_missing_variants(self):
+        with self.captureOnCommitCallbacks():
+            recipe_id = self.create(image_data((600, 300))).json()['id']
+        output = StringIO()
+        call_command(
+            'generate_image_variants', '--allow-local-cache', stdout=output)
+        self.assertEqual(output.getvalue().strip(), 'Processed 1 recipes')
+        self.assert_variants(recipe_id)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1000)
+    def test_oversized_upload_is_rejected(self):
+        response = self.create(image_data((600, 300), 'BMP'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'image': ['Image is too large.']})
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_are_rejected(self):
+        # A few hundred bytes of PNG that decode to more pixels than allowed.
+        image = image_data((1000, 1000))
+        self.assertLess(len(image), 10000)
+        response = self.create(image)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'image': ['Image is too large.']})
+
+
+class ReadRepresentationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(recipes=20, users=5, tags=3, ingredients=10)
+        Recipe.objects.filter(id=Recipe.objects.first().id).update(
+            image_webp='recipes/images/bench.webp', name='Борщ\u2028')
+
+    def test_values_match_serializer(self):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        view = RecipeViewSet(request=request, format_kwarg=None, kwargs={})
+        ids = list(Recipe.objects.values_list('id', flat=True))
+        expected = RecipeSerializer(
+            view.get_queryset(AnonymousUser()).filter(id__in=ids),
+            many=True, context={'request': request}
+        ).data
+        actual = load_recipes(ids, request.build_absolute_uri)
+        self.assertEqual(len(actual), len(ids))
+        for data in expected:
+            data = dict(data)
+            self.assertEqual(list(actual[data['id']]), list(data))
+            for field in ('ingredients', 'tags'):
+                data[field] = sorted(data[field], key=lambda row: row['id'])
+                actual[data['id']][field].sort(key=lambda row: row['id'])
+            self.assertEqual(
+                JSONRenderer().render(actual[data['id']]),
+                JSONRenderer().render(data)
+            )
+
+    def test_fast_renderer_matches_json_renderer(self):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        data = list(load_recipes(
+            Recipe.objects.values_list('id', flat=True),
+            request.build_absolute_uri
+        ).values())
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class RecipeMarkBatchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        data = seed(recipes=20, users=3, tags=3, ingredients=10,
+                    favorites_per_user=0)
+        cls.user = data['users'][0]
+        cls.ids = list(
+            Recipe.objects.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                '/api/recipes/favorite/', {'ids': ids}, format='json')
+        return response, len(queries)
+
+    def counters(self):
+        return dict(Recipe.objects.values_list('id', 'favorites_count'))
+
+    def test_add_and_remove_are_idempotent(self):
+        response, _ = self.send('post', self.ids[:5])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json(), {'added': self.ids[:5]})
+        response, _ = self.send('post', self.ids[3:8] + self.ids[3:4])
+        self.assertEqual(response.json(), {'added': self.ids[5:8]})
+        self.assertEqual(
+            self.counters(), {id: int(id in self.ids[:8]) for id in self.ids})
+        response, _ = self.send('delete', self.ids[6:10])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'removed': self.ids[6:8]})
+        self.assertEqual(
+            self.counters(), {id: int(id in self.ids[:6]) for id in self.ids})
+
+    def test_query_count_does_not_grow_with_batch(self):
+        _, small = self.send('post', self.ids[:2])
+        _, large = self.send('post', self.ids[2:])
+        self.assertEqual(small, large)
+        _, small = self.send('delete', self.ids[:2])
+        _, large = self.send('delete', self.ids[2:])
+        self.assertEqual(small, large)
+
+    def test_unknown_recipe_rejects_batch(self):
+        response, _ = self.send('post', [self.ids[0], max(self.ids) + 1])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.favorite.through.objects.exists())
+
+
+class RecipeCounterTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=cls.user, name=f'recipe {i}', text='text',
+                cooking_time=10, image='recipes/images/bench.gif'
+            ) for i in range(3)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def counters(self, field):
+        return list(
+            Recipe.objects.order_by('id').values_list(field, flat=True))
+
+    def test_single_changes_adjust_counters(self):
+        recipe = self.recipes[1]
+        for relation, field in (
+            ('favorite', 'favorites_count'),
+            ('shopping_cart', 'in_carts_count')
+        ):
+            url = f'/api/recipes/{recipe.id}/{relation}/'
+            self.assertEqual(self.client.post(url).status_code, 201)
+            self.assertEqual(self.client.post(url).status_code, 400)
+            self.assertEqual(self.counters(field), [0, 1, 0])
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.assertEqual(self.client.delete(url).status_code, 400)
+            self.assertEqual(self.counters(field), [0, 0, 0])
+
+    def test_batch_changes_adjust_counters(self):
+        ids = [recipe.id for recipe in self.recipes]
+        url = '/api/recipes/shopping_cart/'
+        self.client.post(url, {'ids': ids[:2]}, format='json')
+        self.assertEqual(self.counters('in_carts_count'), [1, 1, 0])
+        self.client.delete(url, {'ids': ids[1:]}, format='json')
+        self.assertEqual(self.counters('in_carts_count'), [1, 0, 0])
+
+    def test_popularity_ordering(self):
+        first, second, third = self.recipes
+        Recipe.objects.filter(id=second.id).update(favorites_count=5)
+        Recipe.objects.filter(id=first.id).update(favorites_count=2)
+        response = self.client.get(
+            '/api/recipes/', {'ordering': '-popularity'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [second.id, first.id, third.id]
+        )
+
+    def test_reconcile_repairs_drifted_counters(self):
+        first, second, third = self.recipes
+        self.user.favorites.add(first, second)
+        self.user.shopping_cart.add(third)
+        Recipe.objects.filter(id=first.id).update(favorites_count=7)
+        Recipe.objects.filter(id=third.id).update(in_carts_count=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_recipe_counters', stdout=StringIO())
+        output = StringIO()
+        call_command(
+            'reconcile_recipe_counters', '--allow-local-cache', stdout=output)
+        self.assertEqual(
+            output.getvalue().strip(), 'Checked 3 recipes, fixed 3')
+        self.assertEqual(self.counters('favorites_count'), [1, 1, 0])
+        self.assertEqual(self.counters('in_carts_count'), [0, 0, 1])
+
+
+class ShoppingCartExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass')
+        grams = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        kilos = Ingredient.objects.create(name='Соль', measurement_unit='кг')
+        for name, amounts in (('Суп', (5, 1)), ('Каша', (3, 2))):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=name, text='Вкусно', cooking_time=10,
+                image='recipes/images/bench.gif'
+            )
+            UsableIngredient.objects.bulk_create([
+                UsableIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount)
+                for ingredient, amount in zip((grams, kilos), amounts)
+            ])
+            cls.user.shopping_cart.add(recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def download(self, **kwargs):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_text_keeps_units_apart(self):
+        for accept in ('*/*', 'application/json', 'text/plain'):
+            response, content = self.download(HTTP_ACCEPT=accept)
+            self.assertTrue(response['Content-Type'].startswith('text/plain'))
+            self.assertEqual(
+                content.decode(), 'Соль (г) - 8.0\nСоль (кг) - 3.0\n')
+
+    def test_csv(self):
+        for kwargs in (
+            {'data': {'format': 'csv'}}, {'HTTP_ACCEPT': 'text/csv'}
+        ):
+            response, content = self.download(**kwargs)
+            self.assertTrue(response['Content-Type'].startswith('text/csv'))
+            self.assertEqual(content.decode().splitlines(), [
+                'name,measurement_unit,amount', 'Соль,г,8.0', 'Соль,кг,3.0'
+            ])
+
+    def test_pdf(self):
+        response, content = self.download(
+            data={'format': 'pdf'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+
+    def test_unknown_format_is_not_found(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'xls'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    MEDIA_ROOT=mkdtemp(), BACKGROUND_TASKS_ASYNC=False, FEED_BACKFILL_SIZE=2
+)
+class FeedTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.stranger = [
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass')
+            for name in ('author', 'reader', 'stranger')
+        ]
+        cls.old_recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=cls.author, name=f'recipe {i}', text='text',
+                cooking_time=10, image='recipes/images/bench.gif'
+            ) for i in range(3)
+        ])
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        cls.tag = Tag.objects.create(
+            name='Обед', collor='#E26C2D', slug='lunch')
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def subscribe(self, method='post'):
+        self.client.force_authenticate(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                f'/api/users/{self.author.id}/subscribe/')
+        self.assertLess(response.status_code, 300, response.content)
+
+    def publish(self):
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'name': 'new', 'text': 'text', 'cooking_time': 10,
+                'image': IMAGE, 'tags': [self.tag.id],
+                'ingredients': [{'id': self.ingredient.id, 'amount': 1}]
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_subscribe_backfills_and_unsubscribe_removes(self):
+        self.subscribe()
+        self.assertEqual(
+            self.feed(self.reader),
+            [recipe.id for recipe in self.old_recipes[:0:-1]]
+        )
+        self.subscribe('delete')
+        self.assertEqual(self.feed(self.reader), [])
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_new_recipe_reaches_followers(self):
+        self.subscribe()
+        recipe_id = self.publish()
+        self.assertEqual(self.feed(self.reader)[0], recipe_id)
+        self.assertEqual(self.feed(self.stranger), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_pulled_recipe_is_in_feed(self):
+        self.subscribe()
+        recipe_id = self.publish()
+        self.assertTrue(Recipe.objects.get(id=recipe_id).feed_pull)
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe_id=recipe_id).exists())
+        self.assertEqual(self.feed(self.reader)[0], recipe_id)
+        self.assertEqual(self.feed(self.stranger), [])
+
+
+class SubscriptionListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author-{i}', email=f'author-{i}@example.com',
+                password='pass'
+            ) for i in range(5)
+        ]
+        for author in cls.authors:
+            Recipe.objects.bulk_create([
+                Recipe(
+                    author=author, name=f'{author.username} {i}', text='text',
+                    cooking_time=10, image='recipes/images/bench.gif'
+                ) for i in range(4)
+            ])
+        cls.user.subscriptions.add(*cls.authors)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        return self.client.get('/api/users/subscriptions/', params)
+
+    def test_page_is_limited_per_author(self):
+        response = self.get(page=2, limit=2, recipes_limit=3)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(
+            [author['id'] for author in data['results']],
+            [author.id for author in self.authors[2:4]]
+        )
+        for author in data['results']:
+            self.assertEqual(author['recipes_count'], 4)
+            self.assertEqual(len(author['recipes']), 3)
+            self.assertTrue(all(
+                recipe['name'].startswith(author['username'])
+                for recipe in author['recipes']
+            ))
+
+    def test_invalid_recipes_limit_is_rejected(self):
+        response = self.get(recipes_limit='many')
+        self.assertEqual(response.status_code, 400)
+
+
+def api_routes(patterns=None, prefix=''):
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern).lstrip('^')
+        if isinstance(pattern, URLPattern):
+            yield route
+        else:
+            yield from api_routes(pattern.url_patterns, route)
+
+
+@override_settings(MEDIA_ROOT=mkdtemp())
+class EndpointBudgetTests(APITestCase):
+    """Fails when an endpoint exceeds its budget in benchmark_budgets.json.
+
+    Latency depends on the machine, so only query counts and response sizes
+    are checked here; ``manage.py benchmark_api --check`` checks them all.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.budgets = load_budgets()
+        cls.data = seed(**cls.budgets['dataset'])
+        prepare(cls.data)
+
+    def test_endpoints_within_budget(self):
+        token = Token.objects.get(user=self.data['users'][0])
+        for name, scenario in scenarios(self.data).items():
+            with self.subTest(name):
+                result = run_scenario(scenario, token, repeat=5)
+                self.assertEqual(result['status'], scenario.status)
+                self.assertEqual(
+                    check_budget(
+                        result, self.budgets['endpoints'][name],
+                        metrics=('queries', 'bytes')
+                    ), []
+                )
+
+    def test_every_route_has_a_scenario(self):
+        covered = {
+            resolve(scenario.path.split('?')[0]).route
+            for scenario in scenarios(self.data).values()
+        }
+        routes = {
+            route for route in api_routes()
+            if route.startswith('api/') and '<format>' not in route
+        }
+        self.assertEqual(routes - covered, set())
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
@@ -12,9 +13,24 @@ router.register('ingredients', IngredientsViewSet, 'ingredients')
 
 urlpatterns = [
     path('recipes/download_shopping_cart/', ShoppingCartGet.as_view()),
+    path('recipes/shopping_cart/', ShoppingCartView.as_view()),
+    path('recipes/favorite/', FavoriteView.as_view()),
     path('recipes/<int:recipe_id>/shopping_cart/', ShoppingCartView.as_view()),
     path('recipes/<int:recipe_id>/favorite/', FavoriteView.as_view()),
     path('users/subscriptions/', SubscriptionsGetView.as_view()),
     path('users/<int:user_id>/subscribe/', SubscribeView.as_view()),
     path('', include(router.urls)),
 ]
+
+if settings.SERVER_MODE == 'asgi':
+    from . import async_views
+
+    urlpatterns = [
+        path(
+            'recipes/download_shopping_cart/',
+            async_views.download_shopping_cart
+        ),
+        path('recipes/', async_views.recipe_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('ingredients/', async_views.ingredient_list),
+    ] + urlpatterns
@@ -1,23 +1,39 @@
+from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.permissions import BasePermission, IsAuthenticated
-from rest_framework.exceptions import PermissionDenied, ParseError
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import (
+    ParseError, PermissionDenied, ValidationError
+)
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+
+from django.db.models import Count, Prefetch, Value
 
-from api.models import Tag, Recipe, Ingredient
+from api.models import Tag, Recipe, Ingredient, UsableIngredient
 from .serializers import (
-    RecipeSerializer, TagSerializer, IngredientSerializer, RecipeDeserializer
+    RecipeSerializer, TagSerializer, IngredientSerializer,
+    SubscriptionSerializer
+)
+from . import cache, representations
+from .autocomplete import get_search_limit, ingredient_index
+from .feed import backfill_feed, get_feed, remove_from_feed
+from .conditional import (
+    catalog_state, conditional, recipe_list_state, recipe_state
 )
+from .filters import RecipeFilterBackend
+from .negotiation import FirstRendererFallback
+from .renderers import (
+    ShoppingCartCSVRenderer, ShoppingCartPDFRenderer, ShoppingCartTextRenderer
+)
+from .shopping_cart import export_shopping_cart
+from .tasks import submit_on_commit
+from foodgram.db import ReplicaReadMixin
+from foodgram.pagination import CursorPagination, PageNumberPagination
 from users.models import User
-from users.serializer import UserSerializer
-
-
-class PageNumberPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'limit'
 
 
 class IsAuthenticatedForCurMethod(BasePermission):
@@ -32,36 +48,91 @@ class TagViewSet(ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    @conditional(catalog_state(cache.TAGS_VERSION_KEY))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional(catalog_state(cache.TAGS_VERSION_KEY))
+    def list(self, request, *args, **kwargs):
+        return Response(cache.get_catalog(
+            cache.TAGS_VERSION_KEY, 'tags',
+            lambda: super(TagViewSet, self).list(request).data
+        ))
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+
+class IngredientsViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
+    queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
 
-    def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        if 'name' in self.request.query_params:
-            queryset = queryset.filter(
-                name__startswith=self.request.query_params.get('name'))
-        return queryset
+    @conditional(catalog_state(cache.INGREDIENTS_VERSION_KEY))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional(catalog_state(cache.INGREDIENTS_VERSION_KEY))
+    def list(self, request, *args, **kwargs):
+        if 'name' not in request.query_params:
+            return Response(cache.get_catalog(
+                cache.INGREDIENTS_VERSION_KEY, 'ingredients',
+                lambda: super(IngredientsViewSet, self).list(request).data
+            ))
+        return Response(ingredient_index.search(
+            request.query_params.get('name'),
+            get_search_limit(request.query_params)
+        ))
 
 
-class RecipeViewSet(ModelViewSet, PageNumberPagination):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet, PageNumberPagination):
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedForCurMethod,)
     pagination_class = PageNumberPagination
-
-    def get_queryset(self):
-        queryset = Recipe.objects.all()
-        if int(self.request.query_params.get('is_favorited', 0)):
-            queryset &= self.request.user.favorites.all()
-        if int(self.request.query_params.get('is_in_shopping_cart', 0)):
-            queryset &= self.request.user.shopping_cart.all()
-        if 'tags' in self.request.query_params:
-            new_queryset = queryset.none()
-            for i in self.request.query_params.getlist('tags'):
-                new_queryset = new_queryset.union(
-                    queryset.filter(tags__slug=i))
-            queryset = new_queryset
-        return queryset
+    filter_backends = (RecipeFilterBackend,)
+
+    def get_queryset(self, user=None):
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags', Prefetch(
+                'ingredients',
+                UsableIngredient.objects.select_related('ingredient')
+            )
+        ).with_user_flags(user or self.request.user)
+
+    @conditional(recipe_list_state)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(Recipe.objects.only('id'))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            self.get_cached_data([recipe.id for recipe in page]))
+
+    @conditional(recipe_state)
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        data = self.get_cached_data([recipe_id])
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        paginator = CursorPagination()
+        queryset = self.filter_queryset(get_feed(request.user).only('id'))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            self.get_cached_data([recipe.id for recipe in page]))
+
+    def get_cached_data(self, ids):
+        flags = cache.get_user_flags(self.request.user)
+        return [
+            cache.apply_user_flags(data, flags)
+            for data in cache.get_recipes(
+                ids, self.load_recipes, self.request.build_absolute_uri('/')
+            )
+        ]
+
+    def load_recipes(self, ids):
+        return representations.load_recipes(
+            ids, self.request.build_absolute_uri)
 
     def perform_update(self, serializer):
         if serializer.instance.author != self.request.user:
@@ -74,82 +145,178 @@ class RecipeViewSet(ModelViewSet, PageNumberPagination):
         return super().perform_destroy(instance)
 
 
-class ShoppingCartView(APIView):
-    permission_classes = (IsAuthenticated,)
+class RecipeMarkView(APIView):
+    """Adds recipes to, or removes them from, one of the user's lists.
 
-    def get_object(self, pk):
-        return Recipe.objects.get(id=pk)
-
-    def post(self, request, recipe_id):
-        recipe = self.get_object(recipe_id)
-        if recipe.shopping_cart.filter(id=request.user.id).exists():
-            raise ParseError('This recipe alredy in your shopping cart.')
-        recipe.shopping_cart.add(request.user)
-        serializer = RecipeSerializer(recipe, context={'request': request})
+    ``recipes/<id>/<list>/`` handles one recipe, ``recipes/<list>/`` a batch
+    sent as ``{"ids": [...]}``. Link rows and counters change in one
+    transaction, so a counter only moves when its row was actually inserted
+    or deleted. Every change locks the user's row first: ``bulk_create``
+    with ``ignore_conflicts`` does not report which rows it inserted, so
+    batches rely on no other request changing the user's links meanwhile.
+    """
+    permission_classes = (IsAuthenticated,)
+    relation = None
+    counter = None
+    exists_message = None
+    missing_message = None
+
+    def post(self, request, recipe_id=None):
+        if recipe_id is None:
+            added = self.mark(request.user, self.get_batch_ids(request))
+            return Response({'added': added}, status=status.HTTP_201_CREATED)
+        recipe_id = self.get_recipe_id(recipe_id)
+        with transaction.atomic():
+            self.lock_user(request.user)
+            _, created = self.get_through().objects.get_or_create(
+                recipe_id=recipe_id, user=request.user)
+            if not created:
+                raise ParseError(self.exists_message)
+            Recipe.objects.filter(id=recipe_id).adjust_counter(
+                self.counter, 1)
+        self.invalidate(request.user, [recipe_id])
         return Response(
-            serializer.data, status=status.HTTP_201_CREATED
+            self.get_recipe_data(request, recipe_id),
+            status=status.HTTP_201_CREATED
         )
-    
-    def delete(self, request, recipe_id):
-        recipe = self.get_object(recipe_id)
-        if not recipe.shopping_cart.filter(id=request.user.id).exists():
-            raise ParseError('This recipe is not in your shopping cart.')
-        recipe.shopping_cart.remove(request.user)
+
+    def delete(self, request, recipe_id=None):
+        if recipe_id is None:
+            removed = self.unmark(request.user, self.get_batch_ids(request))
+            return Response({'removed': removed})
+        recipe_id = self.get_recipe_id(recipe_id)
+        with transaction.atomic():
+            self.lock_user(request.user)
+            deleted, _ = self.get_links(request.user, [recipe_id]).delete()
+            if not deleted:
+                raise ParseError(self.missing_message)
+            Recipe.objects.filter(id=recipe_id).adjust_counter(
+                self.counter, -1)
+        self.invalidate(request.user, [recipe_id])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_recipe_id(self, recipe_id):
+        if not Recipe.objects.filter(id=recipe_id).exists():
+            raise Http404
+        return recipe_id
+
+    def get_batch_ids(self, request):
+        ids = request.data.get('ids') if isinstance(
+            request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            raise ParseError('ids must be a non-empty list of recipe ids.')
+        if len(ids) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise ParseError(
+                f'At most {settings.RECIPE_BATCH_MAX_SIZE} recipes at once.')
+        try:
+            ids = list(dict.fromkeys(int(id) for id in ids))
+        except (TypeError, ValueError):
+            raise ParseError('ids must be integers.')
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list('id', flat=True))
+        missing = [id for id in ids if id not in found]
+        if missing:
+            raise ValidationError({'ids': [
+                f"Recipes not found: {', '.join(map(str, missing))}."
+            ]})
+        return ids
+
+    def get_through(self):
+        return getattr(Recipe, self.relation).through
+
+    def get_links(self, user, ids):
+        return self.get_through().objects.filter(user=user, recipe_id__in=ids)
+
+    def mark(self, user, ids):
+        """Link the recipes to the user; return the ids that were new."""
+        through = self.get_through()
+        with transaction.atomic():
+            self.lock_user(user)
+            linked = set(
+                self.get_links(user, ids).values_list('recipe_id', flat=True))
+            added = [id for id in ids if id not in linked]
+            through.objects.bulk_create([
+                through(recipe_id=id, user_id=user.id) for id in added
+            ], ignore_conflicts=True)
+            Recipe.objects.filter(id__in=added).adjust_counter(
+                self.counter, 1)
+        self.invalidate(user, added)
+        return added
+
+    def unmark(self, user, ids):
+        """Unlink the recipes; return the ids that were linked."""
+        with transaction.atomic():
+            self.lock_user(user)
+            links = self.get_links(user, ids)
+            linked = set(links.values_list('recipe_id', flat=True))
+            removed = [id for id in ids if id in linked]
+            if removed:
+                links.delete()
+            Recipe.objects.filter(id__in=removed).adjust_counter(
+                self.counter, -1)
+        self.invalidate(user, removed)
+        return removed
+
+    def lock_user(self, user):
+        list(User.objects.select_for_update().filter(id=user.id).values('id'))
+
+    def invalidate(self, user, ids):
+        # Raw link rows do not send m2m_changed, so drop the caches here.
+        if ids:
+            cache.invalidate_recipe_counters(ids)
+            cache.invalidate_users([user.id])
+
+    def get_recipe_data(self, request, recipe_id):
+        data = representations.load_recipes(
+            [recipe_id], request.build_absolute_uri)[recipe_id]
+        return cache.apply_user_flags(data, cache.get_user_flags(request.user))
+
+
+class ShoppingCartView(RecipeMarkView):
+    relation = 'shopping_cart'
+    counter = 'in_carts_count'
+    exists_message = 'This recipe alredy in your shopping cart.'
+    missing_message = 'This recipe is not in your shopping cart.'
+
 
 class ShoppingCartGet(APIView):
     permission_classes = (IsAuthenticated,)
 
-    def get(self, request):
-        queryset = request.user.shopping_cart.all()
-        ingredients = {}
-        for recipe in queryset:
-            cur_ingredients = RecipeSerializer(
-                recipe, context={'request': request}).data.get('ingredients')
-            for ingredient in cur_ingredients:
-                if ingredient.get('name') not in ingredients:
-                    ingredients[ingredient.get('name')] = {
-                        'amount': ingredient.get('amount'),
-                        'measurement_unit': ingredient.get('measurement_unit')
-                    }
-                else:
-                    ingredients[
-                        ingredient.get('name')
-                    ]['amount'] += ingredient.get('amount')
-        txt = ''
-        for name, value in ingredients.items():
-            txt += f"{name} ({value['measurement_unit']}) - {value['amount']}"
-            txt += '\n'
-
-        response = HttpResponse(txt, content_type='text/plain; charset=utf8')
-        response[
-            'Content-Disposition'] = 'attachment; filename=shopping_cart.txt'
-        return response
-
-
-class FavoriteView(APIView):
-    permission_classes = (IsAuthenticated,)
+    renderer_classes = (
+        ShoppingCartTextRenderer, ShoppingCartCSVRenderer,
+        ShoppingCartPDFRenderer
+    )
+    content_negotiation_class = FirstRendererFallback
 
-    def get_object(self, pk):
-        return Recipe.objects.get(id=pk)
-
-    def post(self, request, recipe_id):
-        recipe = self.get_object(recipe_id)
-        if recipe.favorite.filter(id=request.user.id).exists():
-            raise ParseError('This recipe alredy in favorite.')
-        recipe.favorite.add(request.user)
-        serializer = RecipeSerializer(recipe, context={'request': request})
-        return Response(
-            serializer.data, status=status.HTTP_201_CREATED
+    def get(self, request):
+        group_by = request.query_params.get('group_by')
+        if group_by not in (None, 'recipe'):
+            raise ParseError('Unknown group_by value.')
+        return export_shopping_cart(
+            [request.user], request.accepted_renderer.format, group_by
         )
-    
-    def delete(self, request, recipe_id):
-        recipe = self.get_object(recipe_id)
-        if not recipe.favorite.filter(id=request.user.id).exists():
-            raise ParseError('This recipe is not in your favorite.')
-        recipe.favorite.remove(request.user)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FavoriteView(RecipeMarkView):
+    relation = 'favorite'
+    counter = 'favorites_count'
+    exists_message = 'This recipe alredy in favorite.'
+    missing_message = 'This recipe is not in your favorite.'
+
+
+def get_recipes_limit(request):
+    if 'recipes_limit' not in request.query_params:
+        return None
+    try:
+        return int(request.query_params.get('recipes_limit'))
+    except ValueError:
+        raise ParseError('recipes_limit must be an integer.')
+
+
+def get_subscriptions_queryset(queryset):
+    return queryset.annotate(
+        recipes_count=Count('recipes'), is_subscribed=Value(True)
+    ).order_by('id')
 
 
 class SubscribeView(APIView):
@@ -164,12 +331,14 @@ class SubscribeView(APIView):
             user == request.user):
             raise ParseError('Unable to follow this user.')
         user.subscribers.add(request.user)
-        user_data = UserSerializer(user, context={'request': request}).data
-        recipes = RecipeDeserializer(user.recipes.all(), many=True).data
-        user_data['recipes'] = recipes
-        user_data['recipes_count'] = user.recipes.count()
+        submit_on_commit(backfill_feed, request.user.id, user.id)
+        user = get_subscriptions_queryset(User.objects).get(id=user.id)
+        SubscriptionSerializer.attach_recipes(
+            [user], get_recipes_limit(request))
+        serializer = SubscriptionSerializer(
+            user, context={'request': request})
         return Response(
-            user_data, status=status.HTTP_201_CREATED
+            serializer.data, status=status.HTTP_201_CREATED
         )
     
     def delete(self, request, user_id):
@@ -177,29 +346,20 @@ class SubscribeView(APIView):
         if (not user.subscribers.filter(id=request.user.id).exists()):
             raise ParseError('This user is not in your subscriptions.')
         user.subscribers.remove(request.user)
+        remove_from_feed(request.user.id, user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class SubscriptionsGetView(APIView, PageNumberPagination):
     permission_classes = (IsAuthenticated,)
+    cursor_ordering = 'id'
 
     def get(self, request):
-        subscriptions = request.user.subscriptions.all()
-
-        if 'recipes_limit' in request.query_params:
-            recipes_limit = int(request.query_params.get('recipes_limit'))
-            for user in subscriptions:
-                if user.recipes.count() > recipes_limit:
-                    subscriptions = subscriptions.exclude(id=user.id)
-
+        subscriptions = get_subscriptions_queryset(
+            request.user.subscriptions.all())
         results = self.paginate_queryset(subscriptions, request, view=self)
-        serializer = UserSerializer(
+        SubscriptionSerializer.attach_recipes(
+            results, get_recipes_limit(request))
+        serializer = SubscriptionSerializer(
             results, many=True, context={'request': request})
-        subscriptions_list = list(subscriptions)
-        for i in range(len(serializer.data)):
-            serializer.data[i]['recipes'] = RecipeDeserializer(
-                subscriptions_list[i].recipes.all(), many=True,
-            ).data
-            serializer.data[i]['recipes_count'] = subscriptions_list[
-                i].recipes.count()
         return self.get_paginated_response(serializer.data)
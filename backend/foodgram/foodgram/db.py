@@ -0,0 +1,91 @@
+"""Read replica routing and per-request statement limits for PostgreSQL."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+replica_reads = ContextVar('replica_reads', default=False)
+request_statement_timeout = ContextVar(
+    'request_statement_timeout', default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_primary():
+    """Reads whose results get cached must not lag behind the primary."""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """Bounds the statements run inside the block, in any thread."""
+    token = request_statement_timeout.set(milliseconds)
+    try:
+        yield
+    finally:
+        request_statement_timeout.reset(token)
+
+
+class ReplicaRouter:
+    """Sends reads to the replica while ``replica_reads`` is set."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Serves safe requests of a view from the replica.
+
+    Authentication and permission checks run on the primary first, so a
+    token issued a moment ago is always found.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and replica_configured():
+            self._replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            self._replica_token = None
+            replica_reads.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def apply_statement_timeout(execute, sql, params, many, context):
+    """Bounds a statement by ``request_statement_timeout`` milliseconds.
+
+    ``SET LOCAL`` is sent in the same query string, so in autocommit mode
+    it shares the statement's implicit transaction and nothing outlives
+    it on a pooled connection. Server-side cursors wrap the query in
+    ``DECLARE`` and are left alone.
+    """
+    timeout = request_statement_timeout.get()
+    if (
+        timeout and context['connection'].vendor == 'postgresql' and
+        getattr(context['cursor'].cursor, 'name', None) is None
+    ):
+        sql = f'SET LOCAL statement_timeout = {int(timeout)}; {sql}'
+    return execute(sql, params, many, context)
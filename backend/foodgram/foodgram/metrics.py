@@ -0,0 +1,117 @@
+"""Prometheus metrics kept in process memory.
+
+Every server process has its own registry, so with several workers each
+one reports its own numbers. ``render()`` produces the text exposition
+format served by ``foodgram.views.metrics``.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+registry = []
+_lock = Lock()
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        registry.append(self)
+
+    def samples(self):
+        """Yield ``(name, label pairs, value)`` tuples."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, value=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def samples(self):
+        with _lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield self.name, list(zip(self.labels, labels)), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with _lock:
+            counts, total = self.values.get(
+                labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[labels] = (counts, total + value)
+
+    def samples(self):
+        with _lock:
+            values = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.values.items()
+            ]
+        for labels, counts, total in values:
+            pairs = list(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket', pairs + [('le', bound)], cumulative
+                )
+            yield f'{self.name}_sum', pairs, total
+            yield f'{self.name}_count', pairs, cumulative
+
+
+class Collected(Metric):
+    """A metric read from ``collect()`` at scrape time.
+
+    ``collect`` returns a mapping of label value tuples to numbers; it
+    lets modules expose counters they already keep.
+    """
+
+    def __init__(self, name, documentation, labels, collect,
+                 type='counter'):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+        self.type = type
+
+    def samples(self):
+        for labels, value in self.collect().items():
+            yield self.name, list(zip(self.labels, labels)), value
+
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, pairs, value in metric.samples():
+            lines.append(f'{name}{_format_labels(pairs)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,233 @@
+"""Per-request SQL instrumentation and limits, and sampled profiling.
+
+Every database connection gets an execute wrapper that records queries
+into the log of the request being served. The log lives in a context
+variable, so queries that async views run in worker threads are counted
+too. The middleware turns the log into a ``Server-Timing`` header,
+Prometheus metrics and a warning for requests over the slow thresholds.
+"""
+import logging
+import random
+import re
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import get_ident
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+from . import db, metrics, profiling
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+current_queries = ContextVar('current_queries', default=None)
+
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+requests_total = metrics.Counter(
+    'foodgram_http_requests_total', 'Requests answered.',
+    ('view', 'method', 'status')
+)
+request_duration = metrics.Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Time spent answering a request.', ('view',)
+)
+request_queries = metrics.Histogram(
+    'foodgram_db_queries_per_request', 'SQL queries run by a request.',
+    ('view',), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+request_db_time = metrics.Histogram(
+    'foodgram_db_duration_seconds', 'Time a request spent in SQL queries.',
+    ('view',)
+)
+slow_requests = metrics.Counter(
+    'foodgram_slow_requests_total',
+    'Requests over SLOW_REQUEST_MS or SLOW_REQUEST_QUERIES.', ('view',)
+)
+profiled_requests = metrics.Counter(
+    'foodgram_profiled_requests_total', 'Requests run under the profiler.',
+    ('view',)
+)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else '<unresolved>'
+
+
+def fingerprint(sql):
+    """Normalize ``sql`` so queries differing only in values match."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+        self.duration = 0.0
+
+    def add(self, sql, duration):
+        self.queries.append((sql, duration))
+        self.duration += duration
+
+    def top(self, limit):
+        """The most expensive fingerprints with their count and time."""
+        totals = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            total = totals[fingerprint(sql)]
+            total[0] += 1
+            total[1] += duration
+        return sorted(
+            totals.items(), key=lambda item: item[1][1], reverse=True
+        )[:limit]
+
+
+def record_query(execute, sql, params, many, context):
+    log = current_queries.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.add(sql, perf_counter() - start)
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    # First in the list: execute_wrapper() blocks pop the last wrapper,
+    # which must stay theirs if the connection opened inside one.
+    # record_query comes first so it logs the statements as written.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers[0:0] = [
+            record_query, db.apply_statement_timeout]
+
+
+class InstrumentationMiddleware(MiddlewareMixin):
+    """Counts queries and time of each request.
+
+    Keep it first in ``MIDDLEWARE`` so the time includes the rest of the
+    stack. Streaming response bodies are produced after it returns and
+    are not included.
+    """
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        log, start, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, log, start)
+
+    async def __acall__(self, request):
+        log, start, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, log, start)
+
+    def start(self):
+        log = QueryLog()
+        return log, perf_counter(), current_queries.set(log)
+
+    def finish(self, request, response, log, start):
+        duration = perf_counter() - start
+        view = view_name(request)
+        requests_total.inc(view, request.method, response.status_code)
+        request_duration.observe(duration, view)
+        request_queries.observe(len(log.queries), view)
+        request_db_time.observe(log.duration, view)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={log.duration * 1000:.1f};'
+                f'desc="{len(log.queries)} queries", '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        if (
+            duration * 1000 >= settings.SLOW_REQUEST_MS or
+            len(log.queries) >= settings.SLOW_REQUEST_QUERIES
+        ):
+            slow_requests.inc(view)
+            self.log_slow(request, response, view, log, duration)
+        return response
+
+    def log_slow(self, request, response, view, log, duration):
+        top = ''.join(
+            f'\n  {count}x {total * 1000:.1f} ms  {sql}'
+            for sql, (count, total) in log.top(
+                settings.SLOW_REQUEST_FINGERPRINTS)
+        )
+        logger.warning(
+            'Slow request %s %s (%s) -> %s: %.1f ms, %d queries, '
+            '%.1f ms in SQL%s',
+            request.method, request.path, view, response.status_code,
+            duration * 1000, len(log.queries), log.duration * 1000, top
+        )
+
+
+class StatementTimeoutMiddleware(MiddlewareMixin):
+    """Bounds every SQL statement of a request by DB_STATEMENT_TIMEOUT.
+
+    Management commands and migrations run without the limit. Streaming
+    response bodies are produced after it returns and are not bounded.
+    """
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        with db.statement_timeout(settings.DB_STATEMENT_TIMEOUT):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with db.statement_timeout(settings.DB_STATEMENT_TIMEOUT):
+            return await self.get_response(request)
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Profiles a sample of requests with :mod:`foodgram.profiling`.
+
+    ``PROFILING_SAMPLE_RATE`` of all requests are profiled, and any request
+    carrying a valid signed ``X-Profile`` header. Requests not sampled cost
+    one header lookup and one random number. Only requests served by a
+    thread are profiled; the ASGI event loop is left alone.
+    """
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        sampler = profiling.StackSampler(
+            get_ident(), settings.PROFILING_INTERVAL)
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        view = view_name(request)
+        profiled_requests.inc(view)
+        profiling.record(view, stacks)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def sampled(self, request):
+        header = request.headers.get('X-Profile')
+        if header is not None:
+            return profiling.header_valid(header)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
@@ -0,0 +1,127 @@
+"""Schema operations that keep PostgreSQL tables writable while they run.
+
+On PostgreSQL indexes are built with CONCURRENTLY, unique constraints are
+attached to such an index and foreign keys are added NOT VALID and
+validated afterwards, so writes are only blocked for catalog updates.
+Migrations using them must set ``atomic = False``. Other databases run
+the plain Django operation.
+"""
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently, NotInTransactionMixin
+)
+from django.db import migrations
+from django.db.models import UniqueConstraint
+
+
+def online(operation, schema_editor, model):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    alias = schema_editor.connection.alias
+    if not operation.allow_migrate_model(alias, model):
+        return False
+    operation._ensure_not_in_transaction(schema_editor)
+    return True
+
+
+def add_unique_constraint(schema_editor, name, table, columns):
+    """Builds a unique index concurrently and turns it into a constraint."""
+    quote = schema_editor.quote_name
+    # A failed concurrent build leaves an invalid index with the name.
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}')
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY {quote(name)} ON {quote(table)} '
+        f"({', '.join(map(quote, columns))})"
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} '
+        f'UNIQUE USING INDEX {quote(name)}'
+    )
+
+
+class AddIndexOnline(AddIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if online(self, schema_editor, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if online(self, schema_editor, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state)
+
+
+class AddUniqueConstraintOnline(NotInTransactionMixin,
+                                migrations.AddConstraint):
+    """Adds a ``UniqueConstraint`` over plain fields."""
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not online(self, schema_editor, model):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        constraint = self.constraint
+        if (
+            not isinstance(constraint, UniqueConstraint) or
+            constraint.condition or constraint.contains_expressions or
+            constraint.include or constraint.opclasses or
+            constraint.deferrable
+        ):
+            raise ValueError(f'{constraint.name} cannot be added online.')
+        add_unique_constraint(
+            schema_editor, constraint.name, model._meta.db_table,
+            [model._meta.get_field(name).column for name in constraint.fields]
+        )
+
+
+class AlterFieldOnline(NotInTransactionMixin, migrations.AlterField):
+    """Adds uniqueness, an index or a foreign key to an existing column.
+
+    Other changes to the column are not made on PostgreSQL.
+    """
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not online(self, schema_editor, model):
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        old = from_state.apps.get_model(
+            app_label, self.model_name)._meta.get_field(self.name)
+        new = model._meta.get_field(self.name)
+        table = model._meta.db_table
+        quote = schema_editor.quote_name
+        if new.unique and not old.unique:
+            add_unique_constraint(
+                schema_editor,
+                schema_editor._create_index_name(
+                    table, [new.column], suffix='_uniq'),
+                table, [new.column]
+            )
+        elif new.db_index and not old.db_index:
+            name = schema_editor._create_index_name(table, [new.column])
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} '
+                f'ON {quote(table)} ({quote(new.column)})'
+            )
+        if (
+            new.remote_field and new.db_constraint and
+            not (old.remote_field and old.db_constraint)
+        ):
+            statement = schema_editor._create_fk_sql(
+                model, new, '_fk_%(to_table)s_%(to_column)s')
+            schema_editor.execute(f'{statement} NOT VALID')
+            schema_editor.execute(
+                f"ALTER TABLE {quote(table)} VALIDATE CONSTRAINT "
+                f"{statement.parts['name']}"
+            )
@@ -0,0 +1,51 @@
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ParseError
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Cursor pagination answering 400 to cursors it cannot use."""
+    page_size = 10
+    page_size_query_param = 'limit'
+
+    def decode_cursor(self, request):
+        try:
+            return super().decode_cursor(request)
+        except NotFound:
+            raise ParseError(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            return super().paginate_queryset(queryset, request, view)
+        except (TypeError, ValueError):
+            # The position does not fit the type of the ordering field.
+            raise ParseError(self.invalid_cursor_message)
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    Passing ``?cursor=`` switches to cursor pagination ordered by the view's
+    ``cursor_ordering``: pages are fetched by id without COUNT(*) or OFFSET,
+    so their cost does not depend on depth. Without it the ``page``/``limit``
+    contract is unchanged.
+    """
+    page_size = 10
+    page_size_query_param = 'limit'
+    cursor_pagination_class = CursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param not in request.query_params:
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.cursor_paginator.ordering = getattr(
+            view, 'cursor_ordering', '-id')
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,93 @@
+"""Statistical profiler for sampled requests.
+
+A background thread reads the stack of the thread serving the request
+every ``PROFILING_INTERVAL`` seconds. Stacks are aggregated per view and
+written in the collapsed format read by flamegraph.pl and speedscope,
+one file per view and process in ``PROFILING_DIR``.
+"""
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
+
+from django.conf import settings
+from django.core import signing
+
+HEADER_SALT = 'foodgram.profiling'
+
+profiles = defaultdict(Counter)
+_profiles_lock = Lock()
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Counts the stacks of one thread until stopped."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = Event()
+        self._thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+
+def header_value():
+    """A value for the profiling header, valid for PROFILING_HEADER_MAX_AGE."""
+    return signing.TimestampSigner(salt=HEADER_SALT).sign('profile')
+
+
+def header_valid(value):
+    try:
+        signing.TimestampSigner(salt=HEADER_SALT).unsign(
+            value, max_age=settings.PROFILING_HEADER_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def record(view, stacks):
+    """Add the stacks of one request to its view and rewrite its file."""
+    if not stacks:
+        return
+    with _profiles_lock:
+        profile = profiles[view]
+        profile.update(stacks)
+        lines = [f'{stack} {count}\n' for stack, count in profile.items()]
+    name = re.sub(r'[^\w.-]', '_', view)
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    with NamedTemporaryFile(
+        'w', dir=directory, suffix='.tmp', delete=False
+    ) as file:
+        file.writelines(lines)
+    os.replace(
+        file.name, os.path.join(directory, f'{name}.{os.getpid()}.collapsed'))
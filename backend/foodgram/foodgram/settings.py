@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 from dotenv import load_dotenv
+from importlib.util import find_spec
 from pathlib import Path
 from os import getenv, path
 
@@ -49,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.InstrumentationMiddleware',
+    'foodgram.middleware.ProfilingMiddleware',
+    'foodgram.middleware.StatementTimeoutMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +81,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+# 'asgi' serves the hottest read endpoints with async views.
+SERVER_MODE = getenv('SERVER_MODE', 'wsgi')
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -90,9 +97,24 @@ DATABASES = {
         'USER': getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': getenv('POSTGRES_PASSWORD', default='1234567890'),
         'HOST': getenv('DB_HOST', default='localhost'),
-        'PORT': getenv('DB_PORT', default=5432)
+        'PORT': getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': int(getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': True,
+        # pgbouncer in transaction mode cannot keep named cursors open.
+        'DISABLE_SERVER_SIDE_CURSORS': getenv('DB_PGBOUNCER') == 'true',
     }
 }
+if getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': getenv('DB_REPLICA_HOST'),
+        'PORT': getenv(
+            'DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['foodgram.db.ReplicaRouter']
+# Milliseconds allowed per SQL statement of a request; 0 disables it.
+DB_STATEMENT_TIMEOUT = int(getenv('DB_STATEMENT_TIMEOUT', default=5000))
 
 
 # Password validation
@@ -113,6 +135,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+PASSWORD_HASHERS = [
+    'users.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+if find_spec('argon2') is not None:
+    PASSWORD_HASHERS.insert(0, 'users.hashers.Argon2PasswordHasher')
+
+PASSWORD_SCRYPT_WORK_FACTOR = int(
+    getenv('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(getenv('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(
+    getenv('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    getenv('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(
+    getenv('PASSWORD_ARGON2_PARALLELISM', 8))
+
+LOGIN_ATTEMPTS_LIMIT = int(getenv('LOGIN_ATTEMPTS_LIMIT', 10))
+LOGIN_ATTEMPTS_WINDOW = int(getenv('LOGIN_ATTEMPTS_WINDOW', 15 * 60))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -135,14 +179,83 @@ STATIC_ROOT = path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+RECIPE_THUMBNAIL_SIZE = (480, 480)
+RECIPE_IMAGE_WEBP_QUALITY = 80
+
+BACKGROUND_TASKS_ASYNC = getenv('BACKGROUND_TASKS_ASYNC', 'true') == 'true'
+BACKGROUND_WORKERS = int(getenv('BACKGROUND_WORKERS', 2))
+
+SERVER_TIMING = getenv('SERVER_TIMING', 'true') == 'true'
+SLOW_REQUEST_MS = int(getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(getenv('SLOW_REQUEST_QUERIES', 50))
+SLOW_REQUEST_FINGERPRINTS = 5
+# /metrics answers only loopback and private addresses; nginx does not
+# proxy it, scrape the backend container directly.
+METRICS_ENABLED = getenv('METRICS_ENABLED', 'true') == 'true'
+
+PROFILING_SAMPLE_RATE = float(getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL = float(getenv('PROFILING_INTERVAL', 0.005))
+PROFILING_DIR = getenv('PROFILING_DIR', path.join(BASE_DIR, 'profiles'))
+PROFILING_HEADER_MAX_AGE = 60 * 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTHENTICATION_BACKENDS = ['users.auth_backends.EmailBackend']
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+}
+if getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': getenv('REDIS_URL'),
+    }
+RECIPE_CACHE_TIMEOUT = int(getenv('RECIPE_CACHE_TIMEOUT', 60 * 60))
+
+RECIPE_BATCH_MAX_SIZE = 100
+
+FEED_FANOUT_MAX_FOLLOWERS = int(getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 20
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_MAX_SIZE = int(getenv('INGREDIENT_INDEX_MAX_SIZE', 20000))
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_LOCAL_TIMEOUT = int(getenv('AUTH_TOKEN_LOCAL_TIMEOUT', 30))
+AUTH_TOKEN_CACHE_TIMEOUT = int(getenv('AUTH_TOKEN_CACHE_TIMEOUT', 5 * 60))
+# Seconds a revoked or changed token is kept out of the shared cache.
+AUTH_TOKEN_REVOKED_TIMEOUT = 60
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
@@ -0,0 +1,74 @@
+"""Streaming responses whose content is produced by blocking code under ASGI.
+
+Django 4.1 iterates ``StreamingHttpResponse`` inside the event loop, where
+the database cannot be queried. ``AsyncStreamingHttpResponse`` wraps a
+regular iterator and pulls it in the request's sync thread, and
+``ASGIHandler`` sends such responses chunk by chunk.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.http import StreamingHttpResponse
+
+PARTS_PER_THREAD_HOP = 100
+
+
+async def iterate_in_thread(iterator, size=PARTS_PER_THREAD_HOP):
+    """Yields from a blocking iterator, ``size`` parts per thread hop."""
+    iterator = iter(iterator)
+    take = sync_to_async(
+        lambda: list(islice(iterator, size)), thread_sensitive=True)
+    try:
+        while True:
+            parts = await take()
+            if not parts:
+                return
+            for part in parts:
+                yield part
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            # Releases the server-side cursor if the client went away.
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """Streams a blocking iterator; only ``ASGIHandler`` can send it."""
+    is_async = True
+
+    def __init__(self, streaming_content=(), *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self.async_content = iterate_in_thread(streaming_content)
+
+    def __iter__(self):
+        if self.async_content is not None:
+            raise TypeError(
+                'AsyncStreamingHttpResponse can only be sent by '
+                'foodgram.streaming.ASGIHandler.'
+            )
+        return super().__iter__()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    async def send_response(self, response, send):
+        if not getattr(response, 'is_async', False):
+            return await super().send_response(response, send)
+        content, response.async_content = response.async_content, None
+
+        async def send_with_content(message):
+            # The body goes out right before Django's closing message.
+            if message['type'] == 'http.response.body' and (
+                'body' not in message
+            ):
+                async for part in content:
+                    part = response.make_bytes(part)
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        await super().send_response(response, send_with_content)
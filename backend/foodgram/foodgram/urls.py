@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from .views import DeauthView, CustomObtainAuthToken, import_ingredients
+from .views import DeauthView, CustomObtainAuthToken, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,4 +12,5 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
 ]
 
-import_ingredients()
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path('metrics', metrics))
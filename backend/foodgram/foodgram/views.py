@@ -1,4 +1,7 @@
+from ipaddress import ip_address
+
 from django.contrib.auth import authenticate
+from django.http import Http404, HttpResponse
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -7,17 +10,16 @@ from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from rest_framework.status import HTTP_204_NO_CONTENT
-from json import load
-from sys import argv
 
-from api.models import Ingredient
+from users.throttling import LoginAttempts
+from . import metrics as metrics_registry
 
 
 class DeauthView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request):
-        request.user.auth_token.delete()
+        request.auth.delete()
         return Response({"success": ("Successfully logged out")}, status=HTTP_204_NO_CONTENT)
 
 
@@ -40,17 +42,23 @@ class CustomAuthTokenSerializer(AuthTokenSerializer):
 
         if password:
             if email:
+                attempts = LoginAttempts(email)
+                attempts.check()
                 user = authenticate(request=self.context.get('request'),
                                     email=email, password=password)
             elif username:
+                attempts = LoginAttempts(username)
+                attempts.check()
                 user = authenticate(request=self.context.get('request'),
                                     username=username, password=password)
             else:
                 msg = 'Must include "username" or "email"'
                 raise serializers.ValidationError(msg, code='authorization')
             if not user:
+                attempts.failed()
                 msg = 'Unable to log in with provided credentials.'
                 raise serializers.ValidationError(msg, code='authorization')
+            attempts.reset()
         else:
             msg = 'Must include "username" and "password"'
             raise serializers.ValidationError(msg, code='authorization')
@@ -66,13 +74,19 @@ class CustomObtainAuthToken(ObtainAuthToken):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token, created = Token.objects.get_or_create(user=user)
         return Response({'auth_token': token.key})
 
 
-def import_ingredients():
-    if 'createsuperuser' in argv and not Ingredient.objects.all().exists():
-        with open('foodgram/ingredients.json', 'r') as file:
-            data = load(file)
-        for ingredient in data:
-            Ingredient.objects.create(**ingredient)
+def metrics(request):
+    """Prometheus metrics of this process, for local scrapers only."""
+    address = ip_address(request.META['REMOTE_ADDR'])
+    if not (address.is_loopback or address.is_private):
+        raise Http404
+    return HttpResponse(
+        metrics_registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
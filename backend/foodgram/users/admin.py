@@ -1,4 +1,16 @@
 from django.contrib import admin
+
+from api.shopping_cart import export_shopping_cart
 from .models import User
 
-admin.site.register(User)
+
+@admin.action(description='Выгрузить списки покупок (CSV)')
+def export_shopping_carts(modeladmin, request, queryset):
+    return export_shopping_cart(
+        queryset, 'csv', group_by='user', filename='shopping_carts'
+    )
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    actions = (export_shopping_carts,)
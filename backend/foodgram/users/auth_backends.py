@@ -5,13 +5,16 @@ from django.contrib.auth.backends import ModelBackend
 class EmailBackend(ModelBackend):
     def authenticate(self, request, **kwargs):
         UserModel = get_user_model()
+        # The token is fetched along with the user, so issuing it after a
+        # successful login does not need another query.
+        users = UserModel.objects.select_related('auth_token')
         try:
             email = kwargs.get('email', None)
             if not email:
                 username = kwargs.get('username', None)
-                user = UserModel.objects.get(username=username)
+                user = users.get(username=username)
             else:
-                user = UserModel.objects.get(email=email)
+                user = users.get(email=email)
             if user.check_password(kwargs.get('password', None)):
                 return user
         except UserModel.DoesNotExist:
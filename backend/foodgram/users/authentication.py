@@ -0,0 +1,146 @@
+import pickle
+from hashlib import sha256
+from collections import Counter, OrderedDict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram import metrics
+from .models import User
+
+stats = Counter()
+_stats_lock = Lock()
+
+
+def count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def hit_ratio():
+    hits = stats['local_hits'] + stats['shared_hits']
+    total = hits + stats['misses']
+    return hits / total if total else 0.0
+
+
+def collect_stats():
+    with _stats_lock:
+        return {(name,): value for name, value in stats.items()}
+
+
+metrics.Collected(
+    'foodgram_auth_token_cache_events_total',
+    'Token lookups answered by the local cache, the shared cache or the DB.',
+    ('event',), collect_stats
+)
+metrics.Collected(
+    'foodgram_auth_token_cache_hit_ratio',
+    'Share of token lookups answered without the database.',
+    (), lambda: {(): hit_ratio()}, type='gauge'
+)
+
+
+class LRUCache:
+    """Small thread-safe LRU with a fixed time to live per entry."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_tokens = LRUCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_LOCAL_TIMEOUT)
+
+
+REVOKED = 'revoked'
+
+
+def cache_key(key):
+    # Hashed so cache key names never carry a usable credential.
+    return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that remembers which user a token belongs to.
+
+    Tokens are looked up in a per-process LRU first and in the shared cache
+    second. The local entries live for ``AUTH_TOKEN_LOCAL_TIMEOUT`` seconds;
+    the process that handled the logout forgets the token immediately.
+    With ``REDIS_URL`` set this bounds how long a revoked token is still
+    accepted by other processes. The default ``LocMemCache`` is per process
+    too, so there another worker keeps accepting it for up to
+    ``AUTH_TOKEN_CACHE_TIMEOUT`` seconds.
+
+    Revoking a token leaves a tombstone in the shared cache, and lookups
+    store what they read with ``cache.add``. A lookup that read a token
+    just before it was revoked can therefore not cache it again.
+    """
+
+    def authenticate_credentials(self, key):
+        data = local_tokens.get(key)
+        if data is not None:
+            count('local_hits')
+            return pickle.loads(data)
+        cached = cache.get(cache_key(key))
+        if cached is not None and cached != REVOKED:
+            count('shared_hits')
+            token = cached
+        else:
+            count('misses')
+            user, token = super().authenticate_credentials(key)
+            if cached is not None or not cache.add(
+                cache_key(key), token, settings.AUTH_TOKEN_CACHE_TIMEOUT
+            ):
+                return user, token
+        local_tokens.set(key, pickle.dumps((token.user, token)))
+        return token.user, token
+
+
+def invalidate_token(key):
+    local_tokens.delete(key)
+    cache.set(cache_key(key), REVOKED, settings.AUTH_TOKEN_REVOKED_TIMEOUT)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, created, **kwargs):
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
@@ -1,5 +1,21 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
+
+
+class UserQuerySet(models.QuerySet):
+    def with_subscription_flag(self, user):
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=Value(False))
+        return self.annotate(is_subscribed=Exists(
+            User.subscribers.through.objects.filter(
+                from_user=OuterRef('pk'), to_user=user
+            )
+        ))
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 
 class User(AbstractUser):
@@ -23,5 +39,7 @@ class User(AbstractUser):
     groups = None
     last_login = None
 
+    objects = CustomUserManager()
+
     class Meta:
         ordering = ['id']
@@ -2,6 +2,12 @@ from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from .models import User
 
+# What UserSerializer returns, for reads built from .values() rows.
+USER_READ_FIELDS = (
+    'email', 'id', 'username', 'first_name', 'last_name', 'is_subscribed'
+)
+
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     is_subscribed = serializers.SerializerMethodField('subscribed')
@@ -16,9 +22,12 @@ class UserSerializer(serializers.ModelSerializer):
         return super(UserSerializer, self).create(validated_data)
     
     def subscribed(self, instance):
+        if hasattr(instance, 'is_subscribed'):
+            return instance.is_subscribed
+        user = self.context.get('request').user
         return (
-            self.context.get('request').user in
-            instance.subscribers.all()
+            user.is_authenticated and
+            instance.subscribers.filter(id=user.id).exists()
         )
 
 
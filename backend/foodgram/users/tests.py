@@ -0,0 +1,115 @@
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APITestCase
+
+from .authentication import (
+    CachedTokenAuthentication, cache_key, invalidate_token, local_tokens
+)
+from .models import User
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+
+    def setUp(self):
+        cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.addCleanup(local_tokens.delete, self.token.key)
+
+    def test_key_name_does_not_contain_token(self):
+        self.assertNotIn(self.token.key, cache_key(self.token.key))
+
+    def test_lookup_racing_a_logout_is_not_cached(self):
+        authentication = CachedTokenAuthentication()
+        read = authentication.authenticate_credentials
+        # The token is read, then revoked before the lookup caches it.
+        invalidate_token(self.token.key)
+        self.assertEqual(read(self.token.key)[0], self.user)
+        Token.objects.filter(key=self.token.key).delete()
+        with self.assertRaises(AuthenticationFailed):
+            read(self.token.key)
+
+    def test_revoked_token_is_rejected(self):
+        response = self.client.get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.token.delete()
+        response = self.client.get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(
+    LOGIN_ATTEMPTS_LIMIT=3,
+    PASSWORD_HASHERS=[
+        'users.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ]
+)
+class LoginTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password, **credentials):
+        return self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': password, **credentials
+        })
+
+    def test_failed_logins_are_throttled(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        self.assertEqual(self.login('pass').status_code, 429)
+        response = self.login('pass', email=self.user.email.upper())
+        self.assertEqual(response.status_code, 429)
+
+    def test_successful_login_resets_attempts(self):
+        for _ in range(2):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        self.assertEqual(self.login('pass').status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.login('wrong').status_code, 400)
+        self.assertEqual(self.login('pass').status_code, 200)
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        User.objects.filter(id=self.user.id).update(
+            password=make_password('pass', hasher='pbkdf2_sha1'))
+        self.assertEqual(self.login('pass').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password('pass'))
+
+
+class SetPasswordTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def set_password(self, current_password):
+        return self.client.post('/api/users/set_password/', {
+            'current_password': current_password, 'new_password': 'secret'
+        })
+
+    def test_password_is_changed(self):
+        self.assertEqual(self.set_password('pass').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('secret'))
+
+    def test_wrong_current_password_is_rejected(self):
+        self.assertEqual(self.set_password('wrong').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('pass'))
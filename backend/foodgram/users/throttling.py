@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+
+
+class LoginAttempts:
+    """Counts failed logins per username or email in the cache.
+
+    Once ``LOGIN_ATTEMPTS_LIMIT`` failures pile up within
+    ``LOGIN_ATTEMPTS_WINDOW`` seconds further attempts are rejected before
+    the password is hashed.
+    """
+
+    def __init__(self, identifier):
+        self.key = f'login-attempts:{identifier.strip().lower()}'
+
+    def check(self):
+        if cache.get(self.key, 0) >= settings.LOGIN_ATTEMPTS_LIMIT:
+            raise Throttled(wait=settings.LOGIN_ATTEMPTS_WINDOW)
+
+    def failed(self):
+        cache.add(self.key, 0, settings.LOGIN_ATTEMPTS_WINDOW)
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            cache.set(self.key, 1, settings.LOGIN_ATTEMPTS_WINDOW)
+
+    def reset(self):
+        cache.delete(self.key)
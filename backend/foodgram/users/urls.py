@@ -3,8 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import MyView, UserViewSet, PasswordView
 
 router = DefaultRouter()
-router.register('', UserViewSet)
 router.register('set_password', PasswordView, basename='change-password')
+router.register('', UserViewSet)
 
 urlpatterns = [
     path('me/', MyView.as_view()),
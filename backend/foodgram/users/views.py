@@ -1,20 +1,18 @@
+from django.http import Http404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, mixins
-from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
 
-from .serializer import UserSerializer
+from foodgram.pagination import PageNumberPagination
+from .serializer import (
+    USER_READ_FIELDS, ChangePasswordSerializer, UserSerializer
+)
 from .models import User
 
 
-class PageNumberPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'limit'
-
-
 class MyView(APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -26,16 +24,19 @@ class MyView(APIView):
 
 class PasswordView(GenericViewSet, mixins.CreateModelMixin):
     permission_classes = (IsAuthenticated,)
+    serializer_class = ChangePasswordSerializer
     
     def create(self, request, *args, **kwargs):
         self.object = self.request.user
         serializer = self.get_serializer(data=request.data)
 
         if serializer.is_valid():
-            if self.object.check_password(serializer.data.current_password):
+            if not self.object.check_password(
+                serializer.validated_data['current_password']
+            ):
                 return Response({"current_password": ["Current password not equal new password."]}, status=status.HTTP_400_BAD_REQUEST)
-            self.object.set_password(serializer.data.get("new_password"))
-            self.object.save()
+            self.object.set_password(serializer.validated_data["new_password"])
+            self.object.save(update_fields=['password'])
             response = {
                 'status': 'success',
                 'code': status.HTTP_204_NO_CONTENT,
@@ -53,8 +54,26 @@ class UserViewSet(GenericViewSet, mixins.ListModelMixin, PageNumberPagination,
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = PageNumberPagination
+    cursor_ordering = 'id'
+
+    def get_queryset(self):
+        return super().get_queryset().with_subscription_flag(
+            self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        # Rows are read as dicts, the serializer is only used for writes.
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.values(*USER_READ_FIELDS))
+        return self.get_paginated_response(page)
 
     def retrieve(self, request, *args, **kwargs):
         if not request.user:
             return PermissionDenied('Вы не зарегестрированы')
-        return super().retrieve(request, *args, **kwargs)
+        try:
+            user = self.get_queryset().values(*USER_READ_FIELDS).filter(
+                pk=kwargs['pk']).first()
+        except ValueError:
+            raise Http404
+        if user is None:
+            raise Http404
+        return Response(user)
@@ -1,6 +1,7 @@
 sudo docker-compose up --build -d
-sudo docker-compose exec backend python manage.py makemigrations
 sudo docker-compose exec backend python manage.py migrate
+sudo docker-compose exec backend python manage.py load_ingredients --allow-local-cache
+sudo docker-compose restart backend
 echo Создание администратора
 sudo docker-compose exec backend python manage.py createsuperuser
 sudo docker-compose exec backend python manage.py collectstatic --no-input